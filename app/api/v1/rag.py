@@ -1,16 +1,34 @@
 import os
-import shutil
+import pathlib
+import aiofiles
+import anyio
+import anyio.to_thread
 from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Depends
-from fastapi.responses import JSONResponse
-from app.tools.dependencies import get_current_user, get_current_admin_user
+from fastapi.responses import JSONResponse, StreamingResponse
+from app.core.dependencies import get_current_user, get_current_admin_user
 from app.models.rag import QuestionRequest, AnswerResponse, PDFUploadResponse
-from app.services.rag_service import RAGService
-
-# 创建 RAGService 实例
-rag_service = RAGService()
+from app.services.rag_service import RAGService, get_rag_service
+from app.config import settings
 
 # 支持的文件类型
-SUPPORTED_EXTENSIONS = {'.pdf', '.docx', '.xlsx'}
+SUPPORTED_EXTENSIONS = frozenset({'.pdf', '.docx', '.xlsx'})
+
+# 文档存储目录：模块加载时创建一次，省去每次上传的stat系统调用
+DOC_DIR = pathlib.Path("data/documents")
+DOC_DIR.mkdir(parents=True, exist_ok=True)
+
+# 限制并发的重型检索线程数，避免超额占用CPU核心
+rag_thread_limiter = anyio.CapacityLimiter(os.cpu_count() or 4)
+
+# 搜索结果预览的最大字节数（CJK每字符3字节，按字节截断控制payload大小）
+PREVIEW_MAX_BYTES = 600
+
+def _preview_content(content: str) -> str:
+    """按UTF-8字节上限截断预览文本，避免中文内容payload膨胀"""
+    data = content.encode('utf-8')
+    if len(data) <= PREVIEW_MAX_BYTES:
+        return content
+    return data[:PREVIEW_MAX_BYTES].decode('utf-8', errors='ignore') + "..."
 
 router = APIRouter()
 
@@ -19,27 +37,39 @@ async def upload_document(
     file: UploadFile = File(...),
     title: str = Form(...),
     description: str = Form(None),
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    rag_service: RAGService = Depends(get_rag_service)
 ):
     """上传文档文件（支持PDF、DOCX、XLSX格式）"""
-    # 获取文件扩展名
+    # 获取文件扩展名并检查格式
     file_extension = os.path.splitext(file.filename)[1].lower()
-    
-    # 检查文件格式
     if file_extension not in SUPPORTED_EXTENSIONS:
         raise HTTPException(
             status_code=400, 
             detail=f"不支持的文件格式: {file_extension}。支持格式: {', '.join(SUPPORTED_EXTENSIONS)}"
         )
-    
-    # 创建存储目录
-    os.makedirs("data/documents", exist_ok=True)
-    file_path = f"data/documents/{file.filename}"
-    
-    # 保存文件
-    with open(file_path, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    
+
+    # 只取文件名部分，防止路径穿越（../../etc/passwd之类）
+    file_path = str(DOC_DIR / pathlib.Path(file.filename).name)
+
+    # 分块异步写入磁盘，避免大文件上传阻塞事件循环
+    total_size = 0
+    try:
+        async with aiofiles.open(file_path, "wb") as buffer:
+            while chunk := await file.read(1 << 20):  # 每次读取1MB
+                total_size += len(chunk)
+                if total_size > settings.MAX_UPLOAD_SIZE:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"文件过大，最大支持 {settings.MAX_UPLOAD_SIZE // (1 << 20)}MB"
+                    )
+                await buffer.write(chunk)
+    except HTTPException:
+        # 超过大小限制时清理已写入的部分文件
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+
     # 处理文档
     try:
         result = await rag_service.process_documents(file_path, title, description)
@@ -53,7 +83,8 @@ async def upload_document(
 @router.post("/ask", response_model=AnswerResponse)
 async def ask_question(
     question_data: QuestionRequest,
-    current_user: dict = Depends(get_current_user)
+    current_user: dict = Depends(get_current_user),
+    rag_service: RAGService = Depends(get_rag_service)
 ):
     """提问关于《增删卜易》的问题"""
     try:
@@ -64,11 +95,29 @@ async def ask_question(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"回答问题失败: {str(e)}")
 
+@router.post("/ask-stream")
+async def ask_question_stream(
+    question_data: QuestionRequest,
+    current_user: dict = Depends(get_current_user),
+    rag_service: RAGService = Depends(get_rag_service)
+):
+    """流式提问：SSE逐token返回答案，首个事件为来源信息"""
+    return StreamingResponse(
+        rag_service.generate_answer_stream(question_data.question),
+        media_type="text/event-stream"
+    )
+
 @router.get("/documents")
-async def get_documents(current_user: dict = Depends(get_current_admin_user)):
+async def get_documents(
+    current_user: dict = Depends(get_current_admin_user),
+    rag_service: RAGService = Depends(get_rag_service)
+):
     """获取向量数据库中的文档统计信息"""
     try:
-        document_count = rag_service.get_document_count()
+        # 同步调用放入线程池执行，避免阻塞事件循环
+        document_count = await anyio.to_thread.run_sync(
+            rag_service.get_document_count, limiter=rag_thread_limiter
+        )
         return {
             "document_count": document_count,
             "message": f"向量数据库中共有 {document_count} 个文档块"
@@ -77,10 +126,16 @@ async def get_documents(current_user: dict = Depends(get_current_admin_user)):
         raise HTTPException(status_code=500, detail=f"获取文档信息失败: {str(e)}")
 
 @router.delete("/clear")
-async def clear_documents(current_user: dict = Depends(get_current_admin_user)):
+async def clear_documents(
+    current_user: dict = Depends(get_current_admin_user),
+    rag_service: RAGService = Depends(get_rag_service)
+):
     """清空向量数据库"""
     try:
-        success = rag_service.clear_vector_store()
+        # 同步调用放入线程池执行，避免阻塞事件循环
+        success = await anyio.to_thread.run_sync(
+            rag_service.clear_vector_store, limiter=rag_thread_limiter
+        )
         if success:
             return {"message": "向量数据库已清空"}
         else:
@@ -92,19 +147,26 @@ async def clear_documents(current_user: dict = Depends(get_current_admin_user)):
 async def search_documents(
     query: str,
     k: int = 5,
-    current_user: dict = Depends(get_current_admin_user)  # 需要管理员权限
+    doc_id: str = None,
+    current_user: dict = Depends(get_current_admin_user),  # 需要管理员权限
+    rag_service: RAGService = Depends(get_rag_service)
 ):
-    """搜索相似文档（调试用）"""
+    """搜索相似文档（调试用），可限定在单个文档内检索"""
     try:
-        documents = rag_service.search_similar_documents(query, k)
-        results = []
-        for doc in documents:
-            results.append({
-                "content": doc.page_content[:200] + "..." if len(doc.page_content) > 200 else doc.page_content,
+        # 同步检索放入线程池执行，避免阻塞事件循环
+        documents = await anyio.to_thread.run_sync(
+            rag_service.search_similar_documents, query, k, doc_id,
+            limiter=rag_thread_limiter
+        )
+        results = [
+            {
+                "content": _preview_content(doc.page_content),
                 "source": doc.metadata.get("source", "未知"),
                 "title": doc.metadata.get("title", "未知"),
                 "doc_id": doc.metadata.get("doc_id", "未知")
-            })
+            }
+            for doc in documents
+        ]
         return {
             "query": query,
             "results": results,
@@ -119,7 +181,8 @@ async def init_zengshan_document(
     file_path: str, 
     title: str, 
     description: str = None,
-    current_user: dict = Depends(get_current_admin_user)
+    current_user: dict = Depends(get_current_admin_user),
+    rag_service: RAGService = Depends(get_rag_service)
 ):
     """
     上传《增删卜易》文档
@@ -148,7 +211,8 @@ async def ask_zengshan_question(
     question: str, 
     volume: str = None, 
     chapter: str = None,
-    current_user: dict = Depends(get_current_user)    
+    current_user: dict = Depends(get_current_user),
+    rag_service: RAGService = Depends(get_rag_service)
 ):
     """提问《增删卜易》相关问题"""
     
@@ -1,10 +1,15 @@
 from fastapi import APIRouter, HTTPException, status, Query, Depends
 from typing import Optional
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.user import UserCreate, UserUpdate, UserResponse, UserListResponse, LoginRequest, Token
 from app.services.user_service import UserService
 from app.database.mysql_db import get_db
-from app.tools.dependencies import get_current_user, get_current_active_user, get_current_admin_user
+from app.core.dependencies import (
+    get_current_user,
+    get_current_active_user,
+    get_current_admin_user,
+    invalidate_user_cache,
+)
 
 
 router = APIRouter()
@@ -14,7 +19,7 @@ router = APIRouter()
 @router.post("/auth/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(
     user_data: UserCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """用户注册（公开）"""
     try:
@@ -29,7 +34,7 @@ async def register_user(
 @router.post("/auth/login", response_model=Token)
 async def login(
     login_data: LoginRequest,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """用户登录（公开）"""
     result = await UserService.login_user(db, login_data)
@@ -51,24 +56,32 @@ async def get_current_user_info(
  
 @router.get("/", response_model=UserListResponse)
 async def get_users(
-    skip: int = Query(0, ge=0, description="跳过记录数"),
+    skip: int = Query(0, ge=0, le=10000, description="跳过记录数（兼容旧客户端，深分页请用cursor）"),
     limit: int = Query(100, ge=1, le=1000, description="每页记录数"),
     is_active: Optional[bool] = Query(None, description="是否激活"),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description="上一页返回的next_cursor，用于keyset分页"),
+    db: AsyncSession = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)  # 需要登录
 ):
     """获取用户列表"""
-    return await UserService.get_users(
-        db=db,
-        skip=skip,
-        limit=limit,
-        is_active=is_active
-    )
+    try:
+        return await UserService.get_users(
+            db=db,
+            skip=skip,
+            limit=limit,
+            is_active=is_active,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user(
     user_id: str, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)  # 需要登录
 ):
     """根据ID获取用户"""
@@ -84,7 +97,7 @@ async def get_user(
 async def update_user(
     user_id: str, 
     user_data: UserUpdate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserResponse = Depends(get_current_user)  # 需要登录
 ):
     """更新用户信息（需要登录）"""
@@ -101,6 +114,8 @@ async def update_user(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="用户不存在"
         )
+    # 密码/角色等已变更，立即逐出缓存的认证结果，不等TTL过期
+    invalidate_user_cache(user_id)
     return user
 
 # ==================== 管理员专用端点 ====================
@@ -108,7 +123,7 @@ async def update_user(
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_user(
     user_id: str, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserResponse = Depends(get_current_admin_user)  # 需要管理员权限
 ):
     """删除用户（需要管理员权限）"""
@@ -118,12 +133,14 @@ async def delete_user(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="用户不存在"
         )
+    # 用户已删除，立即逐出缓存的认证结果，不等TTL过期
+    invalidate_user_cache(user_id)
     return None
 
 @router.patch("/{user_id}/deactivate", status_code=status.HTTP_200_OK)
 async def deactivate_user(
     user_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserResponse = Depends(get_current_admin_user)  # 需要管理员权限
 ):
     """停用用户（软删除，需要管理员权限）"""
@@ -133,12 +150,14 @@ async def deactivate_user(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="用户不存在"
         )
+    # 被停用的用户不能再凭缓存通过认证，立即逐出
+    invalidate_user_cache(user_id)
     return {"message": "用户已停用"}
 
 @router.patch("/{user_id}/activate", status_code=status.HTTP_200_OK)
 async def activate_user(
     user_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserResponse = Depends(get_current_admin_user)  # 需要管理员权限
 ):
     """激活用户（需要管理员权限）"""
@@ -152,12 +171,14 @@ async def activate_user(
     # 更新用户为激活状态
     update_data = UserUpdate(is_active=True)
     await UserService.update_user(user_id, db, update_data)
-    
+
+    # 激活状态已变更，逐出可能缓存的旧认证结果
+    invalidate_user_cache(user_id)
     return {"message": "用户已激活"}
 
 # 初始化示例数据
 @router.post("/init/sample-data", status_code=status.HTTP_201_CREATED)
-async def init_sample_data(db: Session = Depends(get_db)):
+async def init_sample_data(db: AsyncSession = Depends(get_db)):
     """初始化示例用户数据（仅用于测试）"""
     await UserService.init_sample_data(db)
     return {"message": "示例数据初始化成功"}
\ No newline at end of file
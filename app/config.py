@@ -1,4 +1,5 @@
 import os
+from functools import lru_cache, cached_property
 from pydantic_settings import BaseSettings
 from typing import Optional
 
@@ -25,10 +26,34 @@ class Settings(BaseSettings):
     VECTOR_STORE_PATH: str = "./data/vector_store"
     PDF_STORAGE_PATH: str = "./data/pdfs"
     
+    # Redis配置（未设置时答案缓存自动禁用）
+    REDIS_URL: Optional[str] = None
+    ANSWER_CACHE_TTL: int = 3600  # 答案缓存过期时间（秒）
+
+    # 文件上传限制（字节）
+    MAX_UPLOAD_SIZE: int = 100 * 1024 * 1024  # 100MB
+
     # RAG 参数
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
     SIMILARITY_TOP_K: int = 5
+    EMBED_BATCH_SIZE: int = 64  # 每次嵌入调用的文本块数量
+    EMBED_CONCURRENCY: int = 16  # 并发在途的嵌入请求数上限
+    MAX_CONTEXT_CHARS: int = 12000  # 提交给LLM的上下文字符数上限（限制prefill开销）
+    ANSWER_REQUIRE_CONTEXT: bool = True  # 检索为空时直接返回，不再调用LLM
+
+    # 向量索引参数（HNSW，检索复杂度随库规模亚线性增长）
+    # 注意：Chroma不支持标量量化（int8）存储，向量以FP32保存；
+    # 若语料规模超过~25万块、内存成为瓶颈，应考虑迁移到支持
+    # 量化的后端（如FAISS IndexHNSWSQ），届时内存占用可降约4倍；
+    # GPU检索（faiss.index_cpu_to_gpu）同样依赖该迁移，百万级向量
+    # 之前CPU上的HNSW检索已在亚毫秒级，无需GPU
+    HNSW_SPACE: str = "cosine"  # 距离度量：cosine / l2 / ip
+    HNSW_M: int = 32            # 每个节点的出边数，越大召回越好、内存越高
+    HNSW_CONSTRUCTION_EF: int = 100   # 建图时的候选队列长度
+    HNSW_SEARCH_EF: int = 100         # 检索时的候选队列长度（默认10对k=5召回偏低）
+    HNSW_BATCH_SIZE: int = 10000      # 内存缓冲的写入批量
+    HNSW_SYNC_THRESHOLD: int = 20000  # 触发索引落盘的阈值
     
     # # Agent配置
     # AGENT_MODEL_NAME: str = "gpt-3.5-turbo"
@@ -41,7 +66,6 @@ class Settings(BaseSettings):
     # GROQ_API_KEY: Optional[str] = None
 
     # 数据库配置
-    DATABASE_HOST: str = "localhost"
     DATABASE_HOST: str = "YOUR_DB_HOST"
     DATABASE_PORT: int = 3306
     DATABASE_USER: str = "YOUR_DB_USER"
@@ -50,24 +74,43 @@ class Settings(BaseSettings):
 
     # 数据库URL（可选，如果设置了会覆盖上面的配置）
     DATABASE_URL: Optional[str] = None
+
+    # 数据库连接池配置（按并发worker数调整，避免请求排队等连接）
+    DB_POOL_SIZE: int = 20      # 常驻连接数
+    DB_MAX_OVERFLOW: int = 10   # 高峰期允许的临时连接数
+    DB_POOL_TIMEOUT: int = 30   # 等待连接的超时时间（秒）
     
     # 安全配置
     CORS_ORIGINS: list = ["*"]
 
+    # 密码哈希配置（argon2id），成本参数可按目标机器调整（单次哈希约250ms）
+    PASSWORD_HASH_TIME_COST: int = 3        # 迭代次数
+    PASSWORD_HASH_MEMORY_COST: int = 65536  # 内存消耗（KiB）
+    PASSWORD_HASH_PARALLELISM: int = 4      # 并行度
+
     # JWT配置
     JWT_SECRET_KEY: str = "your-secret-key-change-in-production"  # 生产环境要修改
     JWT_ALGORITHM: str = "HS256"
     JWT_ACCESS_TOKEN_EXPIRE_MINUTES: int = 30  # token过期时间（分钟）
 
-    @property
+    @cached_property
     def database_url(self) -> str:
-        """获取数据库连接URL"""
+        """获取数据库连接URL（只在首次访问时拼接一次）"""
         if self.DATABASE_URL:
             return self.DATABASE_URL
-        return f"mysql+pymysql://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}?charset=utf8mb4"
+        return f"mysql+aiomysql://{self.DATABASE_USER}:{self.DATABASE_PASSWORD}@{self.DATABASE_HOST}:{self.DATABASE_PORT}/{self.DATABASE_NAME}?charset=utf8mb4"
     
     class Config:
         env_file = ".env"
         case_sensitive = True
 
-settings = Settings()
\ No newline at end of file
+@lru_cache
+def get_settings() -> Settings:
+    """获取配置单例
+
+    Settings()构造时会重新解析.env和环境变量，lru_cache保证
+    整个进程只构造一次；也可以作为FastAPI依赖注入，方便测试中覆盖。
+    """
+    return Settings()
+
+settings = get_settings()
\ No newline at end of file
@@ -1,6 +1,7 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from cachetools import TTLCache
 from app.database.mysql_db import get_db
 from app.services.user_service import UserService
 
@@ -8,9 +9,30 @@ from app.services.user_service import UserService
 # 它会检查 Authorization 头，格式应该是: Bearer <token>
 security = HTTPBearer()
 
+# 当前用户缓存：以原始token为key，短TTL内重复请求跳过JWT解码和数据库查询
+# TTL远小于token有效期，角色变更/停用最多延迟60秒生效
+user_cache = TTLCache(maxsize=10000, ttl=60)
+
+def invalidate_user_cache(user_id: str = None):
+    """使当前用户缓存失效（停用/删除/改密/改角色后调用）
+
+    缓存以token为key，而变更方只知道user_id，因此按缓存值中的
+    用户ID反查并逐出对应条目；用户变更是低频操作，对上限1万条
+    的缓存做一次线性扫描可以接受。
+
+    参数:
+        user_id: 要失效的用户ID，为None时清空整个缓存
+    """
+    if user_id is None:
+        user_cache.clear()
+        return
+    stale = [token for token, user in user_cache.items() if user.id == user_id]
+    for token in stale:
+        user_cache.pop(token, None)
+
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """
     获取当前用户依赖项
@@ -32,7 +54,15 @@ async def get_current_user(
         HTTPException: 如果 token 无效或用户不存在
     """
     token = credentials.credentials
+
+    # 命中缓存时跳过JWT解码和数据库查询
+    user = user_cache.get(token)
+    if user is not None:
+        return user
+
     user = await UserService.get_current_user(db, token)
+    if user is not None:
+        user_cache[token] = user
     if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
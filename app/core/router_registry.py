@@ -1,11 +1,18 @@
 import importlib
 import pkgutil
+from functools import lru_cache
 from fastapi import APIRouter, FastAPI
 import logging
 from app.config import settings
 
 logger = logging.getLogger(__name__)
 
+# 特殊模块的路由配置：(前缀后缀, 标签)；未列出的模块走默认规则
+_ROUTER_CONFIG = {
+    'health': ('', ['health']),
+    'users': ('/users', ['users']),
+}
+
 def auto_register_routers(app: FastAPI, package_name: str = "app.api.v1"):
     """
     自动注册路由
@@ -21,35 +28,16 @@ def auto_register_routers(app: FastAPI, package_name: str = "app.api.v1"):
         return
     
     routers_found = 0
-    
-    # 遍历包中的所有模块
-    for _, module_name, is_pkg in pkgutil.iter_modules(package.__path__):
-        if is_pkg:
-            # 如果是子包，递归处理
-            sub_package_name = f"{package_name}.{module_name}"
-            routers_found += auto_register_routers_from_package(app, sub_package_name)
-        else:
-            # 如果是模块，尝试导入并注册路由
-            full_module_name = f"{package_name}.{module_name}"
-            routers_found += register_router_from_module(app, full_module_name)
-    
-    logger.info(f"自动注册了 {routers_found} 个路由模块")
 
-def auto_register_routers_from_package(app: FastAPI, package_name: str) -> int:
-    """从包中自动注册路由"""
-    routers_found = 0
-    try:
-        package = importlib.import_module(package_name)
-    except ImportError as e:
-        logger.warning(f"无法导入包 {package_name}: {e}")
-        return 0
-    
-    for _, module_name, is_pkg in pkgutil.iter_modules(package.__path__):
+    # walk_packages一次遍历整个包树（含子包），不再手动递归、
+    # 也不重复import子包或逐层拼接模块名
+    for _, full_module_name, is_pkg in pkgutil.walk_packages(
+        package.__path__, prefix=f"{package_name}."
+    ):
         if not is_pkg:
-            full_module_name = f"{package_name}.{module_name}"
             routers_found += register_router_from_module(app, full_module_name)
-    
-    return routers_found
+
+    logger.info(f"自动注册了 {routers_found} 个路由模块")
 
 def register_router_from_module(app: FastAPI, module_name: str) -> int:
     """从模块注册路由"""
@@ -75,27 +63,18 @@ def register_router_from_module(app: FastAPI, module_name: str) -> int:
     
     return 0
 
+@lru_cache(maxsize=None)
 def get_router_config(module_name: str) -> tuple[str, list[str]]:
     """
-    根据模块名获取路由配置
-    
+    根据模块名获取路由配置（查表分发，结果缓存）
+
     Returns:
         tuple: (prefix, tags)
     """
-    # 从模块名中提取最后一部分作为标签
-    module_parts = module_name.split('.')
-    module_base_name = module_parts[-1]
-    
-    # 特殊模块处理
-    if module_base_name == 'health':
-        prefix = f"{settings.API_PREFIX}"
-        tags = ["health"]
-    elif module_base_name == 'users':
-        prefix = f"{settings.API_PREFIX}/users"
-        tags = ["users"]
-    else:
-        # 默认配置：使用模块名作为标签和路径
-        prefix = f"{settings.API_PREFIX}/{module_base_name}"
-        tags = [module_base_name]
-    
-    return prefix, tags
\ No newline at end of file
+    # rpartition不构造list，只取最后一段作为模块基础名
+    module_base_name = module_name.rpartition('.')[2]
+    suffix, tags = _ROUTER_CONFIG.get(
+        module_base_name,
+        (f"/{module_base_name}", [module_base_name])  # 默认配置：模块名即路径和标签
+    )
+    return settings.API_PREFIX + suffix, tags
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Boolean, DateTime, Enum as SqlEnum
+from sqlalchemy import Column, String, Boolean, DateTime, Index, Enum as SqlEnum
 from sqlalchemy.sql import func
 from app.database.mysql_db import BaseModel  # 修改这里：导入 BaseModel
 from app.models.user import UserRole
@@ -7,7 +7,15 @@ import uuid
 class UserDB(BaseModel):
     """用户数据库模型"""
     __tablename__ = "users" # 指定数据库表名为 "users"
-    
+
+    # 复合索引：列表查询 WHERE is_active=? ORDER BY created_at
+    # 走索引扫描取序，避免filesort。登录按username查（下面的唯一索引
+    # 已覆盖），每请求认证按主键+is_active查，都不需要额外索引
+    __table_args__ = (
+        Index("ix_users_active_created", "is_active", "created_at"),
+    )
+
+
     username = Column(String(50), unique=True, nullable=False, index=True)
     email = Column(String(100), unique=True, nullable=False, index=True)
     full_name = Column(String(100))
@@ -1,23 +1,30 @@
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from app.config import settings
-from sqlalchemy.orm import sessionmaker
 from sqlalchemy import Column, String, DateTime, Boolean
 from sqlalchemy.sql import func
 import uuid
 from sqlalchemy.ext.declarative import declarative_base
 
-engine = create_engine(
+# 异步引擎：数据库I/O不再阻塞事件循环，单个worker可以并发处理大量查询
+engine = create_async_engine(
     settings.database_url,
+    pool_size=settings.DB_POOL_SIZE,            # 常驻连接数，默认5太小，并发下会排队
+    max_overflow=settings.DB_MAX_OVERFLOW,      # 高峰期允许的临时连接数
+    pool_timeout=settings.DB_POOL_TIMEOUT,      # 等待连接的超时时间（秒）
     pool_pre_ping=True,
     pool_recycle=3600,      # 3600秒后回收连接，防止数据库连接超时
+    pool_use_lifo=True,     # 后进先出复用最热的连接，驱动缓冲区留在CPU缓存里，
+                            # 低峰期多余连接也能自然老化被回收
+
     echo=settings.DEBUG     # 在调试模式下输出SQL语句
 )
 
-# 创建数据库会话工厂
-SessionLocal = sessionmaker(
-    autocommit=False,   # 不自动提交，需要手动调用commit()
-    autoflush=False,    # 不自动flush，手动控制何时同步到数据库
-    bind=engine         # 绑定到上面创建的引擎
+# 创建异步数据库会话工厂
+SessionLocal = async_sessionmaker(
+    bind=engine,                # 绑定到上面创建的引擎
+    class_=AsyncSession,
+    autoflush=False,            # 不自动flush，手动控制何时同步到数据库
+    expire_on_commit=False      # commit后不过期对象，避免额外的SELECT刷新
 )
 
 Base = declarative_base()
@@ -26,7 +33,8 @@ class BaseModel(Base):
     """所有模型的基类，包含公共字段"""
     __abstract__ = True  # 这表示这个类不会创建对应的数据库表
     
-    id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()), index=True)
+    # uuid4().hex跳过str()转换和连字符格式化，32字符也更省索引空间
+    id = Column(String(36), primary_key=True, default=lambda: uuid.uuid4().hex, index=True)
     is_active = Column(Boolean, default=True, index=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -35,10 +43,7 @@ class BaseModel(Base):
         return f"<{self.__class__.__name__}(id={self.id})>"
 
 # 依赖注入，用于获取数据库会话
-def get_db():
-    """数据库会话生成器"""
-    db = SessionLocal()  # 创建新的数据库会话
-    try:
-        yield db    # 使用yield生成器返回会话，将会话提供给请求使用
-    finally:
-        db.close()  # 请求结束后关闭会话，释放连接
\ No newline at end of file
+async def get_db():
+    """异步数据库会话生成器"""
+    async with SessionLocal() as db:
+        yield db    # 使用yield生成器返回会话，将会话提供给请求使用
\ No newline at end of file
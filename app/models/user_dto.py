@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field, field_validator # , EmailStr
+from pydantic import BaseModel, Field # , EmailStr
 from typing import Optional, List
 from datetime import datetime
 from enum import Enum
@@ -19,15 +19,8 @@ class UserBase(BaseModel):
 
 class UserCreate(UserBase):
     """创建用户模型"""
-    password: str = Field(..., description="用户密码")
-
-    @field_validator('password')
-    @classmethod
-    def validate_password(cls, v):
-        """密码验证"""
-        if len(v) < 6:
-            raise ValueError('密码长度至少6位')
-        return v
+    # min_length约束在pydantic-core的Rust层执行，无需Python回调
+    password: str = Field(..., min_length=6, description="用户密码（至少6位）")
 
 class UserUpdate(BaseModel):
     """更新用户模型"""
@@ -35,15 +28,7 @@ class UserUpdate(BaseModel):
     full_name: Optional[str] = Field(None, description="用户全名")
     is_active: Optional[bool] = Field(None, description="用户是否激活")
     role: Optional[UserRole] = Field(None, description="用户角色")
-    password: Optional[str] = Field(None, description="用户密码")
-
-    @field_validator('password')
-    @classmethod
-    def validate_password(cls, v):
-        """密码验证（可选）"""
-        if v is not None and len(v) < 6:
-            raise ValueError('密码长度至少6位')
-        return v
+    password: Optional[str] = Field(None, min_length=6, description="用户密码（至少6位）")
 
 class UserInDB(UserBase):
     """数据库中的用户模型"""
@@ -67,6 +52,7 @@ class UserListResponse(BaseModel):
     total: int = Field(..., description="用户总数")
     page: int = Field(..., description="当前页码")
     size: int = Field(..., description="每页大小")
+    next_cursor: Optional[str] = Field(None, description="下一页游标（创建时间），为空表示没有更多数据")
 
     # 认证相关模型
 class Token(BaseModel):
@@ -1,18 +1,193 @@
-from typing import List, Optional
-from langchain_community.document_loaders import UnstructuredExcelLoader, Docx2txtLoader, PyPDFLoader
+from typing import Final, List, Optional
 from langchain_community.chat_models.tongyi import ChatTongyi
 from langchain_chroma import Chroma
 from langchain_openai import OpenAIEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter, CharacterTextSplitter
 from langchain_core.documents import Document
+from langchain_core.messages import SystemMessage, HumanMessage
+import redis.asyncio as aioredis
 from app.utils.doc_preprocessor import ZengShanBuYiPreprocessor
 from app.models.rag import PDFUploadResponse, AnswerResponse
+from collections import OrderedDict
 from datetime import datetime
+from functools import lru_cache, cached_property
 from app.config import settings
+import asyncio
+import concurrent.futures
+import importlib
+import orjson
+import hashlib
+import io
 import logging
+import pickle
+import sqlite3
 import time
 import os
-import uuid
+import re
+import secrets
+
+# 通用问答的系统提示（模块级常量，进程内只分配一次；
+# 作为独立的system消息发送，上游服务可复用其KV缓存）
+_SYSTEM_PROMPT: Final[str] = """你是清代野鹤老人所著《增删卜易》的专业知识问答专家，仅以该书的原文内容、理论体系、术语定义、规则阐释为唯一知识库来源，不掺杂任何其他六爻流派（如《卜筮正宗》《火珠林》）、现代改编观点或实际占问断卦行为。
+
+### 你的核心职责：
+1. 严格基于提供的《增删卜易》资料内容回答
+2. 关键观点必须引用原文，标注具体出处
+3. 对专业术语（如用神、世应、空亡等）要进行通俗解释
+4. 保持客观学术立场，不涉及实际占卜
+
+### 回答结构要求：
+1. **核心结论**：直接回答问题的要点
+2. **原文依据**：引用相关原文支撑观点
+3. **理论解析**：解释涉及的六爻理论和概念
+4. **知识边界**：说明该内容在原著中的位置和意义
+
+### 禁忌规则：
+- 不得引入《增删卜易》之外的任何六爻理论、民间说法或现代观点；
+- 不得回应实际占问断卦类问题（如“我占了一卦，帮忙看看吉凶”），需引导用户聚焦原著知识本身；
+- 不得将知识解读与封建迷信挂钩，需客观呈现《增删卜易》作为传统民俗文化著作的理论内容，注明“相关知识为原著理论表述，仅供文化研究和知识了解参考”；
+- 不得在无原文依据的情况下随意推导、编造理论，确保所有回答都有原著支撑。
+
+现在，请接收用户关于《增删卜易》的知识类问题，严格按照上述要求提供准确、专业、合规的解答。"""
+
+# 《增删卜易》专用问答的系统提示：静态部分同样只构造一次并作为
+# system消息发送，每次调用只插值上下文和问题
+_ZENGSHAN_SYSTEM_PROMPT: Final[str] = """你是一位精通《增删卜易》的易学专家。请基于用户提供的上下文信息回答问题。
+
+要求：
+1. 基于《增删卜易》的原文内容给出准确答案
+2. 对于文言文内容，请提供适当的现代文解释
+3. 如果涉及卜卦方法，请详细说明操作步骤
+4. 如果上下文信息不足，请如实说明
+5. 回答要专业、准确、清晰，体现易学专家的水平"""
+
+# 句子/段落边界正则（模块加载时预编译，一次扫描产出全部边界偏移）
+_BOUNDARY = re.compile(r'(?<=[。.!?！？；\n])')
+
+
+def _fast_split(text: str, size: int, overlap: int) -> List[str]:
+    """
+    单遍正则边界扫描 + 贪心打包的快速分割
+
+    通用分割器逐字符迭代，是纯Python热点；这里先用预编译正则
+    一次性找出所有句子边界，再把相邻句子贪心打包进不超过size
+    的窗口，窗口之间保留约overlap的重叠。
+
+    Args:
+        text: 待分割文本
+        size: 窗口大小（字符）
+        overlap: 窗口重叠（字符）
+
+    Returns:
+        List[str]: 分割后的文本块
+    """
+    if len(text) <= size:
+        return [text] if text else []
+
+    boundaries = [m.start() for m in _BOUNDARY.finditer(text)]
+    if not boundaries or boundaries[-1] != len(text):
+        boundaries.append(len(text))
+
+    chunks = []
+    start = 0
+    prev = 0
+    for boundary in boundaries:
+        if boundary - start > size and prev > start:
+            chunks.append(text[start:prev])
+            # 回退overlap个字符，保持块间上下文衔接
+            start = max(prev - overlap, start + 1)
+        prev = boundary
+    if start < len(text):
+        chunks.append(text[start:])
+    return chunks
+
+# 文档解析/分割进程池：PDF解析是CPU密集操作，放到子进程执行
+# 既不阻塞事件循环，也绕开解释器的GIL竞争
+_POOL = concurrent.futures.ProcessPoolExecutor(
+    max_workers=max(1, (os.cpu_count() or 2) - 1)
+)
+
+
+# 支持的文档类型映射（模块级只构造一次，按扩展名分发加载器）。
+# 值为(模块名, 类名)元组：pypdf/unstructured等重依赖首次加载文档时
+# 才import，避免拖慢服务冷启动；解析后的类会回写到表中缓存
+_LOADERS: Final[dict] = {
+    "docx": ("langchain_community.document_loaders", "Docx2txtLoader"),
+    "pdf": ("langchain_community.document_loaders", "PyPDFLoader"),
+    "xlsx": ("langchain_community.document_loaders", "UnstructuredExcelLoader"),
+}
+
+
+def _resolve_loader(file_extension: str):
+    """按扩展名解析加载器类，首次使用时延迟import并缓存结果"""
+    entry = _LOADERS.get(file_extension)
+    if entry is None or not isinstance(entry, tuple):
+        return entry
+    module_name, class_name = entry
+    loader_class = getattr(importlib.import_module(module_name), class_name)
+    _LOADERS[file_extension] = loader_class
+    return loader_class
+
+
+def _load_and_split_file(file_path: str, title: str, description: Optional[str],
+                         chunk_size: int, chunk_overlap: int) -> List[tuple]:
+    """
+    在子进程中加载并分割单个文档（纯函数，参数和返回值都可pickle）
+
+    Args:
+        file_path: 文件路径
+        title: 文档标题
+        description: 文档描述（可选）
+        chunk_size: 分块大小
+        chunk_overlap: 分块重叠
+
+    Returns:
+        List[tuple]: (page_content, metadata) 元组列表
+
+    Raises:
+        ValueError: 文件不存在或格式不支持时抛出
+    """
+    if not os.path.exists(file_path):
+        raise ValueError(f"文件不存在: {file_path}")
+
+    file_name = os.path.basename(file_path)
+    # splitext不构造中间list，比split(".")[-1]少一次分配
+    file_extension = os.path.splitext(file_name)[1][1:].lower()
+
+    loader_class = _resolve_loader(file_extension)
+    if not loader_class:
+        raise ValueError(f"不支持的文件格式: {file_extension}")
+
+    # 逐页流式加载：每页立即转成轻量元组，不保留加载器产出的
+    # Document对象；加载时间整个文档取一次纳秒时间戳，
+    # 避免每页一次datetime构造和ISO格式化
+    load_ts = time.time_ns()
+    is_zengshan = "增删卜易" in title
+    # 公共元数据只构造一次，循环内update不再逐页新建临时dict
+    base_meta = {
+        "title": title,
+        "description": description or "",
+        "source": file_name,
+        "load_time": load_ts
+    }
+    pages = []
+    for doc in loader_class(file_path).lazy_load():
+        doc.metadata.update(base_meta)
+        # 《增删卜易》文档由专用预处理器分块，这里不做通用分割
+        if not is_zengshan and "增删卜易" in doc.page_content:
+            is_zengshan = True
+        pages.append((doc.page_content, doc.metadata))
+
+    if is_zengshan:
+        return pages
+
+    # 分割阶段边消费边释放原始页文本，峰值内存不再同时持有
+    # 完整文档和完整分块两份拷贝
+    results = []
+    for idx, (content, metadata) in enumerate(pages):
+        pages[idx] = None
+        for piece in _fast_split(content, chunk_size, chunk_overlap):
+            results.append((piece, dict(metadata)))
+    return results
 
 
 class RAGService:
@@ -30,31 +205,55 @@ class RAGService:
             base_url=settings.OPENAI_BASE_URL,
         )
         
-        # 初始化大语言模型
-        self.llm = ChatTongyi(
-            model=settings.LLM_MODEL,
-            api_key=settings.TONYIQWEN_API_KEY,
-            temperature=0.1
-        )
-        
-        # 初始化文本分割器
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP
-        )
-        
         # 初始化向量数据库
         self.vector_store = self._initialize_vector_store()
 
-        # 配置日志
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
+        # 日志配置由应用入口统一完成，这里只取logger
         self.logger = logging.getLogger("RAGService")
 
         self.zengshan_preprocessor = ZengShanBuYiPreprocessor()
 
+        # 文档数量缓存：(写入时刻, 数量)，写入/清空向量库时失效
+        self._count_cache: Optional[tuple] = None
+        self._count_cache_ttl = 5.0  # 秒
+
+        # 嵌入缓存：按内容哈希存储向量，重复上传的块不再调用嵌入接口
+        self._emb_cache = self._initialize_embedding_cache()
+
+        # 查询嵌入LRU缓存：重复提问/换过滤条件重试时省掉嵌入接口往返
+        self._query_cache: OrderedDict = OrderedDict()
+        self._query_cache_size = 512
+
+    @cached_property
+    def llm(self) -> ChatTongyi:
+        """
+        大语言模型客户端（懒加载）
+
+        只在第一次生成答案时构造，纯摄取流程不必付出客户端启动成本
+
+        Returns:
+            ChatTongyi: LLM客户端实例
+        """
+        return ChatTongyi(
+            model=settings.LLM_MODEL,
+            api_key=settings.TONYIQWEN_API_KEY,
+            temperature=0.1
+        )
+
+    @cached_property
+    def _redis(self) -> Optional["aioredis.Redis"]:
+        """
+        Redis客户端（懒加载）
+
+        未配置REDIS_URL时返回None，答案缓存自动禁用
+
+        Returns:
+            Optional[aioredis.Redis]: Redis客户端或None
+        """
+        if not settings.REDIS_URL:
+            return None
+        return aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+
     def _initialize_vector_store(self) -> Chroma:
         """
         初始化并返回向量数据库实例
@@ -62,85 +261,50 @@ class RAGService:
         Returns:
             Chroma: 向量数据库实例
         """
+        # HNSW索引参数在建库时生效：检索复杂度近似O(log N)，
+        # 避免平铺索引O(N·d)的全量扫描
         return Chroma(
             collection_name="rag_vector_store",
             persist_directory=settings.VECTOR_STORE_PATH,
-            embedding_function=self.embeddings_model
+            embedding_function=self.embeddings_model,
+            collection_metadata={
+                "hnsw:space": settings.HNSW_SPACE,
+                "hnsw:M": settings.HNSW_M,
+                "hnsw:construction_ef": settings.HNSW_CONSTRUCTION_EF,
+                # 检索候选队列：Chroma默认10在k=5时召回不足，
+                # HNSW距离计算有SIMD加速，调大到100的延迟代价很小
+                "hnsw:search_ef": settings.HNSW_SEARCH_EF,
+                # 建索引时批量缓冲写入，降低持久化（pickle）周期的频率
+                "hnsw:batch_size": settings.HNSW_BATCH_SIZE,
+                "hnsw:sync_threshold": settings.HNSW_SYNC_THRESHOLD,
+            }
         )
 
-    def _load_document(self, file_path: str, title: str, description: Optional[str] = None) -> List[Document]:
-        """
-        根据文件扩展名加载文档内容
-        
-        Args:
-            file_path: 文件路径
-            title: 文档标题
-            description: 文档描述（可选）
-            
-        Returns:
-            List[Document]: 加载的文档列表
-            
-        Raises:
-            ValueError: 文件不存在或格式不支持时抛出
+    def _initialize_embedding_cache(self) -> sqlite3.Connection:
         """
-        if not os.path.exists(file_path):
-            raise ValueError(f"文件不存在: {file_path}")
-            
-        file_name = os.path.basename(file_path)
-        file_extension = file_name.split(".")[-1].lower()
-        
-        # 支持的文档类型映射
-        loaders = {
-            "docx": Docx2txtLoader,
-            "pdf": PyPDFLoader,
-            "xlsx": UnstructuredExcelLoader,
-        }
-        
-        loader_class = loaders.get(file_extension)
-        if not loader_class:
-            raise ValueError(f"不支持的文件格式: {file_extension}")
-        
-        try:
-            self.logger.info(f"正在加载文档: {file_name}")
-            loader = loader_class(file_path)
-            documents = loader.load()
-            
-            # 为文档添加元数据
-            for doc in documents:
-                doc.metadata.update({
-                    "title": title,
-                    "description": description or "",
-                    "source": file_name,
-                    "load_time": datetime.now().isoformat()
-                })
-                
-            self.logger.info(f"成功加载文档: {file_name}, 共 {len(documents)} 页")
-            return documents
-            
-        except Exception as e:
-            self.logger.error(f"加载文档失败 {file_name}: {str(e)}")
-            raise Exception(f"文档加载失败: {str(e)}")
+        初始化嵌入缓存（SQLite，WAL模式）
 
-    def _split_documents(self, documents: List[Document]) -> List[Document]:
-        """
-        将文档分割成较小的文本块
-        
-        Args:
-            documents: 待分割的文档列表
-            
         Returns:
-            List[Document]: 分割后的文本块列表
+            sqlite3.Connection: 缓存数据库连接
         """
-        if not documents:
-            return []
-            
-        self.logger.info("开始文档分割")
-        chunks = self.text_splitter.split_documents(documents)
-        self.logger.info(f"文档分割完成，共生成 {len(chunks)} 个文本块")
-        
-        return chunks
+        os.makedirs(settings.VECTOR_STORE_PATH, exist_ok=True)
+        conn = sqlite3.connect(
+            os.path.join(settings.VECTOR_STORE_PATH, "emb_cache.sqlite3"),
+            check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (hash TEXT PRIMARY KEY, vector BLOB)"
+        )
+        conn.commit()
+        return conn
+
+    @staticmethod
+    def _content_hash(content: str) -> str:
+        """计算文本块内容的blake2b哈希，作为嵌入缓存的key"""
+        return hashlib.blake2b(content.encode("utf-8"), digest_size=16).hexdigest()
 
-    def _add_documents_to_vector_store(self, chunks: List[Document], doc_id: str) -> None:
+    async def _add_documents_to_vector_store(self, chunks: List[Document], doc_id: str) -> None:
         """
         将文本块添加到向量数据库
         
@@ -151,37 +315,69 @@ class RAGService:
         if not chunks:
             self.logger.warning("没有文本块可添加到向量数据库")
             return
-            
-        # 为每个chunk添加文档ID
-        # for chunk in chunks:
-        #     chunk.metadata["doc_id"] = doc_id
-        
-        # ids = [str(uuid.uuid4()) for _ in range(len(chunks))]
-        # self.logger.info("正在将文档添加到向量数据库")
-        # self.vector_store.add_documents(documents=chunks, ids=ids)
-        # self.logger.info(f"文档已成功添加到向量数据库，共添加 {len(chunks)} 个文档块")
 
-        if not chunks:
-            self.logger.warning("没有文本块可添加到向量数据库")
-            return
-            
-        # 为每个chunk添加文档ID
+        # 为每个chunk添加文档ID和整数序号；复合键只在ids列表中拼一次，
+        # 不再作为字符串重复写进metadata（int比str的pickle体积更小）
         for i, chunk in enumerate(chunks):
             chunk.metadata["doc_id"] = doc_id
-            chunk.metadata["chunk_id"] = f"{doc_id}_{i}"
-        
+            chunk.metadata["chunk_idx"] = i
+
         self.logger.info(f"正在将 {len(chunks)} 个文本块添加到向量数据库")
-        
+
         try:
-            # 分批处理，避免一次性处理太多数据
-            batch_size = 64
-            for i in range(0, len(chunks), batch_size):
-                batch = chunks[i:i + batch_size]
-                self.vector_store.add_documents(batch)
-                self.logger.info(f"已添加批次 {i//batch_size + 1}/{(len(chunks)-1)//batch_size + 1}")
-                
+            # 按内容哈希查缓存，只有未命中的块才调用嵌入接口
+            hashes = [self._content_hash(chunk.page_content) for chunk in chunks]
+            unique_hashes = list(set(hashes))
+            placeholders = ",".join("?" * len(unique_hashes))
+            cursor = self._emb_cache.execute(
+                f"SELECT hash, vector FROM embeddings WHERE hash IN ({placeholders})",
+                unique_hashes
+            )
+            cached = {h: pickle.loads(blob) for h, blob in cursor.fetchall()}
+
+            miss = [(h, chunk) for h, chunk in zip(hashes, chunks) if h not in cached]
+            self.logger.info(f"嵌入缓存命中 {len(chunks) - len(miss)}/{len(chunks)} 个文本块")
+
+            # 未命中的块按长度降序打包成小批并发嵌入：相近长度的文本
+            # 在同一批内减少padding浪费，Semaphore限制在途请求数，
+            # 整体把串行的HTTP往返改成I/O重叠
+            miss.sort(key=lambda pair: len(pair[1].page_content), reverse=True)
+            batch_size = settings.EMBED_BATCH_SIZE
+            batches = [miss[i:i + batch_size] for i in range(0, len(miss), batch_size)]
+            semaphore = asyncio.Semaphore(settings.EMBED_CONCURRENCY)
+
+            async def embed_batch(batch):
+                async with semaphore:
+                    return await self.embeddings_model.aembed_documents(
+                        [chunk.page_content for _, chunk in batch]
+                    )
+
+            if batches:
+                results = await asyncio.gather(*(embed_batch(batch) for batch in batches))
+                for batch, vectors in zip(batches, results):
+                    for (h, _), vector in zip(batch, vectors):
+                        cached[h] = vector
+                self.logger.info(f"并发嵌入完成，共 {len(batches)} 个批次")
+
+            # 新向量写回缓存
+            if miss:
+                self._emb_cache.executemany(
+                    "INSERT OR REPLACE INTO embeddings (hash, vector) VALUES (?, ?)",
+                    [(h, pickle.dumps(cached[h])) for h, _ in miss]
+                )
+                self._emb_cache.commit()
+
+            # 直接带embeddings写入collection，绕过Chroma内部的embedding_function路径
+            self.vector_store._collection.add(
+                ids=[f"{doc_id}:{i}" for i in range(len(chunks))],
+                embeddings=[cached[h] for h in hashes],
+                documents=[chunk.page_content for chunk in chunks],
+                metadatas=[chunk.metadata for chunk in chunks],
+            )
+
             self.logger.info("文档已成功添加到向量数据库")
-            
+            self._count_cache = None  # 数量已变化，使缓存失效
+
         except Exception as e:
             self.logger.error(f"添加文档到向量数据库失败: {str(e)}")
             # 重新抛出异常，让上层处理
@@ -211,16 +407,24 @@ class RAGService:
 
         try:
             # 生成文档唯一ID
-            doc_id = str(uuid.uuid4())
+            # 64位随机ID在单库内已够避免碰撞，比带连字符的UUID短20字节
+            doc_id = secrets.token_hex(8)
             
-            # 1. 加载文档
-            documents = self._load_document(file_path, title, description)
-            
-            # 2. 分割文档
-            chunks = self._split_documents(documents)
+            # 1+2. 在进程池中加载并分割文档：CPU密集的PDF解析
+            # 不再占用事件循环，Document在主进程重建（子进程只传可pickle的元组）
+            loop = asyncio.get_running_loop()
+            raw_chunks = await loop.run_in_executor(
+                _POOL, _load_and_split_file,
+                file_path, title, description,
+                settings.CHUNK_SIZE, settings.CHUNK_OVERLAP
+            )
+            # model_construct跳过pydantic校验：元组内容是子进程刚构造的，
+            # 已知合法，大PDF产生数千块时能省掉一半的构造开销
+            chunks = [Document.model_construct(page_content=content, metadata=metadata)
+                      for content, metadata in raw_chunks]
             
             # 3. 存储到向量数据库
-            self._add_documents_to_vector_store(chunks, doc_id)
+            await self._add_documents_to_vector_store(chunks, doc_id)
             
             # 返回处理结果
             return PDFUploadResponse(
@@ -236,25 +440,177 @@ class RAGService:
             self.logger.error(f"文档处理失败: {str(e)}")
             raise Exception(f"文档处理失败: {str(e)}")
 
-    def search_similar_documents(self, query: str, k: int = 5) -> List[Document]:
+    def search_similar_documents(self, query: str, k: int = 5,
+                                 doc_id: Optional[str] = None) -> List[Document]:
         """
         在向量数据库中搜索相似的文档
-        
+
         Args:
             query: 查询文本
             k: 返回的最相似文档数量
-            
+            doc_id: 只在指定文档内检索（可选）
+
         Returns:
             List[Document]: 相似的文档列表
         """
+        self.logger.info(f"搜索相似文档: {query}")
+        results = self.search_similar_documents_batch([query], k, doc_id=doc_id)[0]
+        self.logger.info(f"找到 {len(results)} 个相关文档")
+        return results
+
+    def search_similar_documents_batch(self, queries: List[str], k: int = 5,
+                                       doc_id: Optional[str] = None) -> List[List[Document]]:
+        """
+        批量搜索相似文档
+
+        多个查询（查询改写/HyDE场景）共享一次嵌入调用和一次HNSW
+        批量查询，把N个查询的N次HTTP往返压缩为1次。
+
+        Args:
+            queries: 查询文本列表
+            k: 每个查询返回的最相似文档数量
+            doc_id: 只在指定文档内检索（可选）
+
+        Returns:
+            List[List[Document]]: 每个查询对应的文档列表
+        """
+        if not queries:
+            return []
         try:
-            self.logger.info(f"搜索相似文档: {query}")
-            results = self.vector_store.similarity_search(query, k=k)
-            self.logger.info(f"找到 {len(results)} 个相关文档")
-            return results
+            query_embeddings = self._embed_queries(queries)
+            # doc_id过滤下推到Chroma：HNSW遍历时直接按元数据跳过
+            # 无关节点，而不是取大k后在Python侧丢弃
+            raw = self.vector_store._collection.query(
+                query_embeddings=query_embeddings,
+                n_results=k,
+                where={"doc_id": doc_id} if doc_id else None,
+                include=["documents", "metadatas"],
+            )
+            return [
+                [
+                    Document(page_content=content, metadata=metadata or {})
+                    for content, metadata in zip(docs, metas)
+                ]
+                for docs, metas in zip(raw["documents"], raw["metadatas"])
+            ]
         except Exception as e:
             self.logger.error(f"文档搜索失败: {str(e)}")
-            return []
+            return [[] for _ in queries]
+
+    def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        批量嵌入查询文本（带LRU缓存）
+
+        重复的问题以及同一问题换过滤条件的重试直接命中缓存，
+        省掉约百毫秒级的嵌入接口往返；缓存上限512条，LRU淘汰。
+
+        Args:
+            queries: 查询文本列表
+
+        Returns:
+            List[List[float]]: 与queries顺序一致的向量列表
+        """
+        vectors = {}
+        miss = []
+        for q in dict.fromkeys(queries):  # 保序去重
+            if q in self._query_cache:
+                self._query_cache.move_to_end(q)
+                vectors[q] = self._query_cache[q]
+            else:
+                miss.append(q)
+
+        if miss:
+            for q, vec in zip(miss, self.embeddings_model.embed_documents(miss)):
+                vectors[q] = vec
+                self._query_cache[q] = vec
+            while len(self._query_cache) > self._query_cache_size:
+                self._query_cache.popitem(last=False)
+
+        return [vectors[q] for q in queries]
+
+    @staticmethod
+    def _source_preview(content: str) -> str:
+        """来源预览：先判断长度再截断，短文本不做任何拼接分配"""
+        return content if len(content) <= 50 else content[:50] + "…"
+
+    @staticmethod
+    def _build_context_text(context_documents: List[Document]) -> str:
+        """拼接上下文文本，累计超过MAX_CONTEXT_CHARS后不再追加
+
+        上限直接约束LLM的prefill计算量；检索结果按相似度排序，
+        被丢弃的只会是排在末尾的低相关块。
+        """
+        parts = []
+        total = 0
+        for doc in context_documents:
+            parts.append(doc.page_content)
+            total += len(doc.page_content)
+            if total >= settings.MAX_CONTEXT_CHARS:
+                break
+        return "\n\n".join(parts)
+
+    def _build_answer_messages(self, question: str, context_text: str) -> list:
+        """构建问答消息列表：静态系统提示 + 动态用户消息
+
+        系统提示固定不变，上游模型服务可以对其命中提示缓存，
+        跳过共享前缀的prefill计算；每次调用只新构造用户消息。
+        """
+        return [
+            SystemMessage(content=_SYSTEM_PROMPT),
+            HumanMessage(content=(
+                f"上下文：\n{context_text}\n\n"
+                f"问题：{question}\n\n"
+                "根据上下文提供准确、相关的答案。如果上下文信息不足以回答问题，请如实说明。"
+            )),
+        ]
+
+    async def generate_answer_stream(self, question: str,
+                                     context_documents: List[Document] = None):
+        """
+        流式生成答案（SSE事件生成器）
+
+        首个事件发送来源信息，之后逐token转发LLM输出；
+        首token延迟从完整生成耗时降到数百毫秒级。
+
+        Args:
+            question: 用户问题
+            context_documents: 上下文文档列表（可选）
+
+        Yields:
+            str: SSE格式的事件数据
+        """
+        # 如果没有提供上下文文档，则进行检索。检索是同步代码
+        # （嵌入HTTP往返+HNSW查询），放到线程执行，不阻塞事件循环
+        if not context_documents:
+            context_documents = await asyncio.to_thread(
+                self.search_similar_documents, question, settings.SIMILARITY_TOP_K
+            )
+
+        # 来源信息在流开始前构建并先行发出，客户端可立即渲染引用
+        sources = [
+            {
+                "source": doc.metadata.get("source", "未知来源"),
+                "content": self._source_preview(doc.page_content),
+                "page": doc.metadata.get("page", 0),
+                "title": doc.metadata.get("title", "")
+            }
+            for doc in context_documents
+        ]
+        yield f"event: sources\ndata: {orjson.dumps(sources).decode()}\n\n"
+
+        context_text = self._build_context_text(context_documents)
+        messages = self._build_answer_messages(question, context_text)
+
+        try:
+            self.logger.info("正在流式生成答案")
+            async for token in self.llm.astream(messages):
+                content = token.content if hasattr(token, 'content') else str(token)
+                if content:
+                    yield f"data: {orjson.dumps(content).decode()}\n\n"
+            yield "event: done\ndata: [DONE]\n\n"
+        except Exception as e:
+            self.logger.error(f"流式答案生成失败: {str(e)}")
+            yield f"event: error\ndata: {orjson.dumps(str(e)).decode()}\n\n"
 
     async def generate_answer(self, question: str, context_documents: List[Document] = None) -> AnswerResponse:
         """
@@ -269,47 +625,53 @@ class RAGService:
         """
         start_time = time.time()
         try:
-            # 如果没有提供上下文文档，则进行检索
+            # 如果没有提供上下文文档，则进行检索（同步的嵌入调用和
+            # HNSW查询放到线程执行，不阻塞事件循环）
             if not context_documents:
-                context_documents = self.search_similar_documents(question, settings.SIMILARITY_TOP_K)
-            
-            # 构建上下文
-            context_text = "\n\n".join([doc.page_content for doc in context_documents])
-            
-            # 构建提示词
-            prompt = f"""
-            你是清代野鹤老人所著《增删卜易》的专业知识问答专家，仅以该书的原文内容、理论体系、术语定义、规则阐释为唯一知识库来源，不掺杂任何其他六爻流派（如《卜筮正宗》《火珠林》）、现代改编观点或实际占问断卦行为。
-
-### 你的核心职责：
-1. 严格基于提供的《增删卜易》资料内容回答
-2. 关键观点必须引用原文，标注具体出处
-3. 对专业术语（如用神、世应、空亡等）要进行通俗解释
-4. 保持客观学术立场，不涉及实际占卜
-
-### 回答结构要求：
-1. **核心结论**：直接回答问题的要点
-2. **原文依据**：引用相关原文支撑观点
-3. **理论解析**：解释涉及的六爻理论和概念
-4. **知识边界**：说明该内容在原著中的位置和意义
-
-### 禁忌规则：
-- 不得引入《增删卜易》之外的任何六爻理论、民间说法或现代观点；
-- 不得回应实际占问断卦类问题（如“我占了一卦，帮忙看看吉凶”），需引导用户聚焦原著知识本身；
-- 不得将知识解读与封建迷信挂钩，需客观呈现《增删卜易》作为传统民俗文化著作的理论内容，注明“相关知识为原著理论表述，仅供文化研究和知识了解参考”；
-- 不得在无原文依据的情况下随意推导、编造理论，确保所有回答都有原著支撑。
-
-现在，请接收用户关于《增删卜易》的知识类问题，严格按照上述要求提供准确、专业、合规的解答。
+                context_documents = await asyncio.to_thread(
+                    self.search_similar_documents, question, settings.SIMILARITY_TOP_K
+                )
 
-上下文：
-{context_text}
+            # 检索为空时短路返回：没有上下文的LLM调用只会花费秒级延迟
+            # 和整段token费用来回答"信息不足"
+            if not context_documents and settings.ANSWER_REQUIRE_CONTEXT:
+                return AnswerResponse(
+                    question=question,
+                    answer="未检索到相关文档内容，请先上传文档或调整问题。",
+                    sources=[],
+                    processing_time=round(time.time() - start_time, 2),
+                    status="no_context"
+                )
 
-问题：{question}
+            # 答案缓存：FAQ类问题高度重复，命中时省掉秒级的LLM调用
+            # key由问题+上下文块ID哈希而成，语料更新后key自然变化
+            cache_key = None
+            if self._redis is not None:
+                chunk_ids = "|".join(sorted(
+                    f"{doc.metadata.get('doc_id', '')}:{doc.metadata.get('chunk_idx', '')}"
+                    for doc in context_documents
+                ))
+                cache_key = "rag:ans:" + hashlib.sha256(
+                    f"{question}|{chunk_ids}".encode("utf-8")
+                ).hexdigest()
+                # 缓存只是加速层：Redis故障/超时/脏数据一律当作
+                # 未命中降级走正常检索+LLM路径，不能拖垮问答本身
+                try:
+                    cached_answer = await self._redis.get(cache_key)
+                    if cached_answer:
+                        self.logger.info("答案缓存命中")
+                        return AnswerResponse.model_validate_json(cached_answer)
+                except Exception as cache_error:
+                    self.logger.warning(f"答案缓存读取失败，降级为未命中: {str(cache_error)}")
 
-根据上下文提供准确、相关的答案。如果上下文信息不足以回答问题，请如实说明。"""
+            # 构建上下文
+            context_text = self._build_context_text(context_documents)
 
+            # 构建提示词
+            messages = self._build_answer_messages(question, context_text)
             # 调用LLM生成答案
             self.logger.info("正在生成答案")
-            response = await self.llm.ainvoke(prompt)
+            response = await self.llm.ainvoke(messages)
             answer = response.content if hasattr(response, 'content') else str(response)
             
             # answer = "已经生成了答案（此处为示例回答）"
@@ -322,39 +684,63 @@ class RAGService:
             for doc in context_documents:
                 source_info = {
                     "source": doc.metadata.get("source", "未知来源"),
-                    "content": doc.page_content[:50] + "..." if len(doc.page_content) > 50 else doc.page_content,  # 截取前50字符
+                    "content": self._source_preview(doc.page_content),  # 截取前50字符
                     "page": doc.metadata.get("page", 0),
                     "title": doc.metadata.get("title", "")
                 }
                 sources.append(source_info)
             
-            return AnswerResponse(
+            answer_response = AnswerResponse(
                 question=question,
                 answer=answer,
                 sources=sources,  # 添加必需的 sources 字段
                 processing_time=processing_time,  # 添加必需的 processing_time 字段
                 status="success"
             )
+
+            # 只缓存成功的回答；写入失败不能丢掉已经生成的答案
+            if cache_key is not None:
+                try:
+                    await self._redis.set(
+                        cache_key,
+                        answer_response.model_dump_json(),
+                        ex=settings.ANSWER_CACHE_TTL
+                    )
+                except Exception as cache_error:
+                    self.logger.warning(f"答案缓存写入失败，跳过缓存: {str(cache_error)}")
+
+            return answer_response
             
         except Exception as e:
             self.logger.error(f"答案生成失败: {str(e)}")
             return AnswerResponse(
                 question=question,
                 answer="抱歉，生成答案时出现错误。",
-                source_documents=[],
+                sources=[],
+                processing_time=round(time.time() - start_time, 2),
                 status="error",
                 error_message=str(e)
             )
 
     def get_document_count(self) -> int:
         """
-        获取向量数据库中的文档数量
-        
+        获取向量数据库中的文档数量（带短TTL缓存）
+
+        管理面板会轮询这个接口，而数量很少变化；
+        缓存命中时O(1)返回，写入/清空操作会使缓存失效。
+
         Returns:
             int: 文档数量
         """
+        if self._count_cache is not None:
+            cached_at, count = self._count_cache
+            if time.monotonic() - cached_at < self._count_cache_ttl:
+                return count
+
         try:
-            return self.vector_store._collection.count()
+            count = self.vector_store._collection.count()
+            self._count_cache = (time.monotonic(), count)
+            return count
         except Exception as e:
             self.logger.error(f"获取文档数量失败: {str(e)}")
             return 0
@@ -369,6 +755,7 @@ class RAGService:
         try:
             self.vector_store.delete_collection()
             self.vector_store = self._initialize_vector_store()
+            self._count_cache = None  # 数量已变化，使缓存失效
             self.logger.info("向量数据库已清空")
             return True
         except Exception as e:
@@ -389,34 +776,40 @@ class RAGService:
             PDFUploadResponse: 处理结果
         """
         try:
-            doc_id = str(uuid.uuid4())
+            # 64位随机ID在单库内已够避免碰撞，比带连字符的UUID短20字节
+            doc_id = secrets.token_hex(8)
             
             self.logger.info(f"开始处理《增删卜易》文档: {title}")
             
-            # 1. 使用专用预处理器提取和解析文本
-            document_data = self.zengshan_preprocessor.extract_text_from_pdf(file_path)
-            
-            # 2. 创建语义完整的知识块
-            chunks = self.zengshan_preprocessor.create_semantic_chunks(document_data)
+            # 1+2. PDF解析和语义分块是CPU密集的同步代码，
+            # 放到线程执行，处理期间事件循环可继续服务其他请求
+            document_data = await asyncio.to_thread(
+                self.zengshan_preprocessor.extract_text_from_pdf, file_path
+            )
+            chunks = await asyncio.to_thread(
+                self.zengshan_preprocessor.create_semantic_chunks, document_data
+            )
             
-            # 3. 添加文档元数据
+            # 3. 添加文档元数据（公共dict构造一次，循环内只做update）
+            base_meta = {
+                "doc_id": doc_id,
+                "book": "增删卜易",
+                "original_title": title,
+                "description": description or "",
+                "content_language": "文言文",
+                "content_era": "清代",
+                "document_type": "易学经典"
+            }
             for chunk in chunks:
-                chunk.metadata.update({
-                    "doc_id": doc_id,
-                    "book": "增删卜易",
-                    "original_title": title,
-                    "description": description or "",
-                    "content_language": "文言文",
-                    "content_era": "清代",
-                    "document_type": "易学经典"
-                })
+                chunk.metadata.update(base_meta)
             
             # 4. 存储到向量数据库
-            self._add_documents_to_vector_store(chunks, doc_id)
+            await self._add_documents_to_vector_store(chunks, doc_id)
             
             # 统计信息
-            volume_count = len(document_data["structure"]["volumes"])
-            chapter_count = sum(len(vol["chapters"]) for vol in document_data["structure"]["volumes"])
+            volumes = document_data["structure"]["volumes"]
+            volume_count = len(volumes)
+            chapter_count = sum(len(vol.chapters) for vol in volumes)
             
             return PDFUploadResponse(
                 id=doc_id,
@@ -431,32 +824,7 @@ class RAGService:
             self.logger.error(f"《增删卜易》处理失败: {str(e)}")
             raise Exception(f"文档处理失败: {str(e)}")
         
-    def _split_documents(self, documents: List[Document]) -> List[Document]:
-        """
-        智能文档分割
-        
-        Args:
-            documents: 待分割的文档列表
-            
-        Returns:
-            List[Document]: 分割后的文本块列表
-        """
-        if not documents:
-            return []
-            
-        # 检查是否为《增删卜易》
-        is_zengshan = any("增删卜易" in doc.metadata.get("title", "") or 
-                         "增删卜易" in doc.page_content for doc in documents)
-        
-        if is_zengshan:
-            self.logger.info("检测到《增删卜易》文档，使用专用分块策略")
-            # 对于已经预处理过的文档，直接返回
-            return documents
-        else:
-            self.logger.info("使用通用分块策略")
-            return self.text_splitter.split_documents(documents)
-        
-    def search_zengshan_documents(self, query: str, k: int = 5, 
+    def search_zengshan_documents(self, query: str, k: int = 5,
                             volume_filter: str = None,
                             chapter_filter: str = None,
                             content_type: str = None) -> List[Document]:
@@ -484,25 +852,36 @@ class RAGService:
                 filter_dict["content_type"] = content_type
                 
             self.logger.info(f"搜索《增删卜易》，过滤器: {filter_dict}")
-            
+
+            # 查询向量走缓存：换卷/章过滤条件重试同一问题时不再重复嵌入
+            query_vec = self._embed_queries([query])[0]
             if filter_dict:
-                results = self.vector_store.similarity_search(
-                    query, k=k, filter=filter_dict
+                results = self.vector_store.similarity_search_by_vector(
+                    query_vec, k=k, filter=filter_dict
                 )
             else:
-                results = self.vector_store.similarity_search(query, k=k)
+                results = self.vector_store.similarity_search_by_vector(query_vec, k=k)
                 
             self.logger.info(f"找到 {len(results)} 个相关文档片段")
             
-            # 按结构排序：卷 -> 章 -> 段落
-            results.sort(key=lambda x: (
-                x.metadata.get("volume_index", "999"),
-                x.metadata.get("chapter_index", "999"),
-                x.metadata.get("paragraph_index", 999),
-                x.metadata.get("content_type", "z")
-            ))
-            
-            return results
+            # 按结构排序：卷 -> 章 -> 段落。DSU（装饰-排序-还原）：
+            # 每个文档的排序键只计算一次，比较阶段不再做dict查找；
+            # 段落号统一补零成字符串，避免int/str混排抛TypeError
+            keyed = []
+            for idx, doc in enumerate(results):
+                m = doc.metadata
+                para = m.get("paragraph_index", 999)
+                keyed.append((
+                    m.get("volume_index", "999"),
+                    m.get("chapter_index", "999"),
+                    f"{para:09d}" if isinstance(para, int) else str(para).zfill(9),
+                    m.get("content_type", "z"),
+                    idx,  # 稳定排序的平局裁决，避免比较Document对象
+                    doc,
+                ))
+            keyed.sort()
+
+            return [entry[-1] for entry in keyed]
             
         except Exception as e:
             self.logger.error(f"文档搜索失败: {str(e)}")
@@ -527,58 +906,66 @@ class RAGService:
         start_time = time.time()
         
         try:
-            # 检索相关文档
+            # 检索相关文档（同步的嵌入调用和向量查询放到线程执行，
+            # 不阻塞事件循环）
             if not context_documents:
-                context_documents = self.search_zengshan_documents(
-                    question, k=5, 
+                context_documents = await asyncio.to_thread(
+                    self.search_zengshan_documents,
+                    question, k=5,
                     volume_filter=volume_filter,
                     chapter_filter=chapter_filter
                 )
-            
-            # 构建详细的上下文信息
-            context_parts = []
-            sources_info = []
-            
-            for i, doc in enumerate(context_documents):
-                # 构建来源信息
-                source_desc = self._build_source_description(doc)
-                
-                source_info = {
-                    "source": source_desc,
-                    "volume": doc.metadata.get("volume_title"),
-                    "chapter": doc.metadata.get("chapter_title"),
-                    "content_type": doc.metadata.get("content_type"),
-                    "block_type": doc.metadata.get("block_type"),
-                    "content_preview": doc.page_content[:150] + "..." if len(doc.page_content) > 150 else doc.page_content
-                }
-                sources_info.append(source_info)
-                
-                # 构建上下文内容
-                context_part = f"[来源 {i+1}: {source_desc}]\n{doc.page_content}"
-                context_parts.append(context_part)
-            
-            context_text = "\n\n".join(context_parts)
-            
-            # 构建针对《增删卜易》的专业提示词
-            prompt = f"""你是一位精通《增删卜易》的易学专家。请基于以下上下文信息回答问题。
 
-    《增删卜易》上下文信息：
-    {context_text}
-
-    问题：{question}
-
-    要求：
-    1. 基于《增删卜易》的原文内容给出准确答案
-    2. 对于文言文内容，请提供适当的现代文解释
-    3. 如果涉及卜卦方法，请详细说明操作步骤
-    4. 如果上下文信息不足，请如实说明
-    5. 回答要专业、准确、清晰，体现易学专家的水平
+            # 检索为空时短路返回，省掉一次注定"信息不足"的LLM调用
+            if not context_documents and settings.ANSWER_REQUIRE_CONTEXT:
+                return AnswerResponse(
+                    question=question,
+                    answer="未检索到相关《增删卜易》内容，请调整问题或过滤条件。",
+                    sources=[],
+                    processing_time=round(time.time() - start_time, 2),
+                    status="no_context"
+                )
 
-    请开始回答："""
+            # 构建详细的上下文信息：来源描述只计算一次，两处复用；
+            # 推导式中绑定局部名m/c，避免逐项重复属性查找
+            source_descs = [self._build_source_description(doc) for doc in context_documents]
+            sources_info = [
+                {
+                    "source": desc,
+                    "volume": m.get("volume_title"),
+                    "chapter": m.get("chapter_title"),
+                    "content_type": m.get("content_type"),
+                    "block_type": m.get("block_type"),
+                    "content_preview": c if len(c) <= 150 else c[:150] + "…"
+                }
+                for desc, doc in zip(source_descs, context_documents)
+                for m, c in ((doc.metadata, doc.page_content),)
+            ]
+            # StringIO增量写入：正文只在getvalue()时拷贝一次，
+            # 不再为每段生成"[来源...]+正文"的中间字符串
+            buf = io.StringIO()
+            write = buf.write
+            for i, (desc, doc) in enumerate(zip(source_descs, context_documents), 1):
+                if i > 1:
+                    write("\n\n")
+                write(f"[来源 {i}: {desc}]\n")
+                write(doc.page_content)
+            context_text = buf.getvalue()
+            
+            # 构建针对《增删卜易》的专业提示：静态要求走system消息
+            # （可被上游提示缓存命中），动态内容只有上下文和问题
+            messages = [
+                SystemMessage(content=_ZENGSHAN_SYSTEM_PROMPT),
+                HumanMessage(content=(
+                    f"《增删卜易》上下文信息：\n{context_text}\n\n"
+                    f"问题：{question}\n\n"
+                    "请开始回答："
+                )),
+            ]
 
             # 生成答案
             self.logger.info("正在调用LLM生成专业答案")
-            response = await self.llm.ainvoke(prompt)
+            response = await self.llm.ainvoke(messages)
             answer = response.content if hasattr(response, 'content') else str(response)
             
             # 计算处理时间
@@ -627,4 +1014,19 @@ class RAGService:
             }
             parts.append(content_type_map.get(doc.metadata["content_type"], doc.metadata["content_type"]))
         
-        return " · ".join(parts)
\ No newline at end of file
+        return " · ".join(parts)
+
+
+@lru_cache(maxsize=1)
+def get_rag_service() -> RAGService:
+    """
+    获取RAGService单例
+
+    构造RAGService需要重新打开Chroma持久化集合并重建嵌入客户端，
+    lru_cache保证每个进程只构造一次；作为FastAPI依赖注入使用，
+    测试中可以用dependency_overrides替换。
+
+    Returns:
+        RAGService: 服务单例
+    """
+    return RAGService()
@@ -1,19 +1,30 @@
+import asyncio
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 import uuid
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func, insert, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import load_only
+from sqlalchemy.ext.asyncio import AsyncSession
 # from app.config import settings
 from app.database.models_db.users_model import UserDB
 from app.models.user import UserCreate, UserUpdate, UserResponse, UserListResponse, LoginRequest
 from app.tools.security import PasswordManager, JWTManager
 
+# 响应路径只需要的列：hashed_password是表中最宽的列且从不进响应，
+# load_only让读查询少传输、少水合这部分数据
+_RESPONSE_ONLY = load_only(
+    UserDB.id, UserDB.username, UserDB.email, UserDB.full_name,
+    UserDB.is_active, UserDB.role, UserDB.created_at, UserDB.updated_at
+)
+
 class UserService:
     """用户服务类，处理用户相关操作"""
 
     @classmethod
     def _generate_user_id(cls) -> str:
-        """生成唯一用户ID"""
-        return str(uuid.uuid4())
+        """生成唯一用户ID（hex形式免去str()转换和连字符）"""
+        return uuid.uuid4().hex
 
     @classmethod
     def _get_current_time(cls) -> datetime:
@@ -21,24 +32,11 @@ class UserService:
         return datetime.now()
 
     @classmethod
-    async def create_user(cls, db: Session, user_data: UserCreate) -> UserResponse:
+    async def create_user(cls, db: AsyncSession, user_data: UserCreate) -> UserResponse:
         """创建新用户"""
 
-        # 检查用户名是否已存在
-        existing_user = db.query(UserDB).filter(
-            (UserDB.username == user_data.username) | 
-            (UserDB.email == user_data.email)
-        ).first()
-
-        if existing_user:
-            if existing_user.email == user_data.email:
-                raise ValueError("邮箱已存在")
-            else:
-                raise ValueError("用户名已存在")
-
-        
-        # 哈希密码
-        hashed_password = PasswordManager.get_password_hash(user_data.password)
+        # 哈希密码（线程池执行，避免argon2阻塞事件循环）
+        hashed_password = await PasswordManager.get_password_hash_async(user_data.password)
 
         user_in_db = UserDB(
             username=user_data.username,
@@ -49,37 +47,56 @@ class UserService:
             role=user_data.role,
         )
 
+        # 不做SELECT预检查，直接插入并依赖唯一索引拦截冲突：
+        # 常见路径（无冲突）省一次往返，也消除了检查和插入之间的竞态
         db.add(user_in_db)
-        db.commit()
-        db.refresh(user_in_db)
+        try:
+            await db.commit()
+        except IntegrityError as e:
+            await db.rollback()
+            # MySQL的重复键报错会带上索引名（... for key 'users.ix_users_email'），
+            # 但同时也带上重复的值本身，所以只能按索引名匹配：按值匹配会把
+            # 含"email"字样的重复用户名误判为邮箱冲突
+            msg = str(e.orig)
+            if "ix_users_email" in msg:
+                raise ValueError("邮箱已存在")
+            if "ix_users_username" in msg:
+                raise ValueError("用户名已存在")
+            # 其他完整性错误（外键等）不属于唯一冲突，原样抛出
+            raise
+        await db.refresh(user_in_db)
 
         return cls._db_to_response(user_in_db)
 
     @classmethod
-    async def get_user_by_id(cls,db:Session, user_id: str) -> Optional[UserResponse]:
+    async def get_user_by_id(cls,db: AsyncSession, user_id: str) -> Optional[UserResponse]:
         """根据ID获取用户"""
-        user = db.query(UserDB).filter(UserDB.id == user_id).first()
+        result = await db.execute(
+            select(UserDB).options(_RESPONSE_ONLY).where(UserDB.id == user_id)
+        )
+        user = result.scalar_one_or_none()
         if user:
             return cls._db_to_response(user)
         return None
     
     @classmethod
-    async def get_user_by_username(cls, db: Session, username: str) -> Optional[UserDB]:
+    async def get_user_by_username(cls, db: AsyncSession, username: str) -> Optional[UserDB]:
         """根据用户名获取用户（内部使用，返回完整数据库模型）"""
-        return db.query(UserDB).filter(UserDB.username == username).first()
+        result = await db.execute(select(UserDB).where(UserDB.username == username))
+        return result.scalar_one_or_none()
     
     @classmethod
-    async def authenticate_user(cls, db: Session, login_data: LoginRequest) -> Optional[UserDB]:
+    async def authenticate_user(cls, db: AsyncSession, login_data: LoginRequest) -> Optional[UserDB]:
         """用户认证"""
         db_user = await cls.get_user_by_username(db, login_data.username)
         if not db_user:
             return None
-        if not PasswordManager.verify_password(login_data.password, db_user.hashed_password):
+        if not await PasswordManager.verify_password_async(login_data.password, db_user.hashed_password):
             return None
         return db_user
     
     @classmethod
-    async def login_user(cls, db: Session, login_data: LoginRequest) -> Optional[dict]:
+    async def login_user(cls, db: AsyncSession, login_data: LoginRequest) -> Optional[dict]:
         """用户登录，返回token"""
         db_user = await cls.authenticate_user(db, login_data)
         if not db_user:
@@ -100,57 +117,116 @@ class UserService:
         }
     
     @classmethod
-    async def get_current_user(cls, db: Session, token: str) -> Optional[UserResponse]:
+    async def get_current_user(cls, db: AsyncSession, token: str) -> Optional[UserResponse]:
         """根据token获取当前用户"""
         payload = JWTManager.verify_token(token)
         if not payload:
             return None
         
-        username: str = payload.get("sub")
         user_id: str = payload.get("user_id")
-        if username is None or user_id is None:
+        if user_id is None:
             return None
-        
-        db_user = await cls.get_user_by_username(db, username)
-        if db_user and db_user.id == user_id and db_user.is_active:
+
+        # token中已带用户ID（签名保证未被篡改），直接走主键等值查询
+        # 并把激活检查并入WHERE，省掉按用户名二级索引查找再比对ID的路径
+        result = await db.execute(
+            select(UserDB).options(_RESPONSE_ONLY)
+            .where(UserDB.id == user_id, UserDB.is_active.is_(True))
+        )
+        db_user = result.scalar_one_or_none()
+        if db_user:
             return cls._db_to_response(db_user)
         return None
 
     @classmethod
     async def get_users(
-        cls, 
-        db: Session,
-        skip: int = 0, 
+        cls,
+        db: AsyncSession,
+        skip: int = 0,
         limit: int = 10,
-        is_active: Optional[bool] = None
+        is_active: Optional[bool] = None,
+        cursor: Optional[str] = None
     ) -> UserListResponse:
-        """获取用户列表，支持分页"""
-        users = db.query(UserDB)
-        
+        """获取用户列表，支持分页
+
+        优先使用游标（keyset）分页：每页都是O(limit)的索引范围扫描，
+        翻页深度不影响耗时；skip/limit仅为兼容旧客户端保留，
+        深分页时MySQL需要扫描并丢弃skip行。
+        """
+        # 总数用窗口函数随行返回：COUNT(*) OVER()在过滤后、分页前计算，
+        # 普通分页只需一次往返，不再单独跑一条COUNT。
+        # 直接选列而非ORM实体：行是轻量Row，跳过实体水合和
+        # instrumented属性访问，_mapping可直接交给pydantic-core
+        query = select(
+            UserDB.id, UserDB.username, UserDB.email, UserDB.full_name,
+            UserDB.is_active, UserDB.role, UserDB.created_at, UserDB.updated_at,
+            func.count().over().label("total"),
+        )
+
         # 过滤激活状态
         if is_active is not None:
-            users = users.filter(UserDB.is_active == is_active)
-        
-        # 获取总数
-        total = users.count()
+            query = query.where(UserDB.is_active == is_active)
 
-        # 分页
-        users_paginated = users.offset(skip).limit(limit).all()
+        # 分页：有游标时走keyset路径，否则退回offset分页。
+        # created_at是秒精度且批量种子行的时间戳完全相同，必须带id
+        # 作平局裁决列，否则页边界上的同秒行会被跳过或重复
+        query = query.order_by(UserDB.created_at.desc(), UserDB.id.desc())
+        if cursor:
+            # 游标来自客户端，格式非法时报ValueError由API层转为400，
+            # 而不是让fromisoformat直接炸成500
+            cursor_ts, _, cursor_id = cursor.partition("|")
+            try:
+                cursor_dt = datetime.fromisoformat(cursor_ts)
+            except ValueError:
+                raise ValueError("无效的分页游标")
+            if not cursor_id:
+                raise ValueError("无效的分页游标")
+            query = query.where(
+                tuple_(UserDB.created_at, UserDB.id) < (cursor_dt, cursor_id)
+            )
+        elif skip:
+            query = query.offset(skip)
+
+        result = await db.execute(query.limit(limit))
+        rows = result.all()
+
+        if rows and not cursor:
+            total = rows[0].total
+        else:
+            # 游标页的窗口计数只覆盖游标之后的行，空页则拿不到窗口值，
+            # 这两种情况退回单独的COUNT查询
+            count_query = select(func.count()).select_from(UserDB)
+            if is_active is not None:
+                count_query = count_query.where(UserDB.is_active == is_active)
+            total = (await db.execute(count_query)).scalar_one()
+
+        # 转换为响应模型（不包含密码）：Row._mapping直接喂给
+        # pydantic-core，多余的total列会被忽略
+        user_responses = [
+            UserResponse.model_validate(row._mapping)
+            for row in rows
+        ]
+
+        # 下一页游标：本页取满limit条时才可能有下一页；
+        # 编码(created_at, id)复合键，与排序键一一对应
+        next_cursor = None
+        if len(rows) == limit:
+            last = rows[-1]
+            next_cursor = f"{last.created_at.isoformat()}|{last.id}"
 
-        # 转换为响应模型（不包含密码）
-        user_responses = [cls._db_to_response(user) for user in users_paginated]
-        
         return UserListResponse(
             users=user_responses,
             total=total,
             page=(skip // limit) + 1 if limit > 0 else 1,
-            size=limit
+            size=limit,
+            next_cursor=next_cursor
         )
     
     @classmethod
-    async def update_user(cls, user_id: str, db: Session, user_data: UserUpdate) -> Optional[UserResponse]:
+    async def update_user(cls, user_id: str, db: AsyncSession, user_data: UserUpdate) -> Optional[UserResponse]:
         """更新用户"""
-        user = db.query(UserDB).filter(UserDB.id == user_id).first()
+        result = await db.execute(select(UserDB).where(UserDB.id == user_id))
+        user = result.scalar_one_or_none()
         if not user:
             return None
         
@@ -158,44 +234,50 @@ class UserService:
         update_data = user_data.model_dump(exclude_unset=True)
         for field, value in update_data.items():
             if field == 'password':
-                # 特殊处理密码更新
-                setattr(user, 'hashed_password', PasswordManager.get_password_hash(value))
+                # 特殊处理密码更新（线程池哈希，不阻塞事件循环）
+                setattr(user, 'hashed_password', await PasswordManager.get_password_hash_async(value))
             else:
                 setattr(user, field, value)
 
         user.updated_at = cls._get_current_time()
-        
-        # 更新存储
-        db.commit()
-        db.refresh(user)
+
+        # 更新存储：会话配置了expire_on_commit=False，提交后对象属性
+        # 仍然有效（包括上面刚赋的updated_at），不需要refresh再SELECT一次
+        await db.commit()
 
         return cls._db_to_response(user)
     
     @classmethod
-    async def pseudo_delete_user(cls, user_id: str, db: Session) -> bool:
+    async def pseudo_delete_user(cls, user_id: str, db: AsyncSession) -> bool:
         """软删除用户"""
-        user = db.query(UserDB).filter(UserDB.id == user_id).first()
+        result = await db.execute(select(UserDB).where(UserDB.id == user_id))
+        user = result.scalar_one_or_none()
         if user:
             user.is_active = False
-            db.commit()
-            db.refresh(user)
+            # 返回值只是bool，不需要refresh回读任何列
+            await db.commit()
             return True
         return False
     
     @classmethod
-    async def delete_user(cls, user_id: str, db: Session) -> bool:
+    async def delete_user(cls, user_id: str, db: AsyncSession) -> bool:
         """删除用户"""
-        user = db.query(UserDB).filter(UserDB.id == user_id).first()
+        result = await db.execute(select(UserDB).where(UserDB.id == user_id))
+        user = result.scalar_one_or_none()
         if user:
-            db.delete(user)
-            db.commit()
+            await db.delete(user)
+            await db.commit()
             return True
         return False
     
     @staticmethod
     def _db_to_response(db_user: UserDB) -> UserResponse:
-        """将数据库模型转换为响应模型"""
-        return UserResponse(
+        """将数据库模型转换为响应模型
+
+        model_construct跳过pydantic校验：字段值来自类型明确的ORM列，
+        不是外部输入，无需再过一遍验证器。
+        """
+        return UserResponse.model_construct(
             id=db_user.id,
             username=db_user.username,
             email=db_user.email,
@@ -207,7 +289,7 @@ class UserService:
         )
 
     @classmethod
-    async def init_sample_data(cls, db: Session):
+    async def init_sample_data(cls, db: AsyncSession):
         """初始化示例数据"""
         sample_users = [
             UserCreate(
@@ -233,12 +315,27 @@ class UserService:
             )
         ]
         
-        for user_data in sample_users:
-            # 检查用户是否已存在
-            existing_user = db.query(UserDB).filter(
-                (UserDB.username == user_data.username) | 
-                (UserDB.email == user_data.email)
-            ).first()
-            
-            if not existing_user:
-                await cls.create_user(db, user_data)
\ No newline at end of file
+        # 并行哈希：argon2在C层释放GIL，线程池里N个样例密码
+        # 同时计算，种子耗时从N×250ms降到约一次哈希的时间
+        hashes = await asyncio.gather(*(
+            PasswordManager.get_password_hash_async(user_data.password)
+            for user_data in sample_users
+        ))
+
+        # 构造批量插入的行（Core insert跳过unit-of-work开销）
+        rows = [
+            {
+                "username": user_data.username,
+                "email": user_data.email,
+                "full_name": user_data.full_name,
+                "hashed_password": hashed,
+                "is_active": user_data.is_active,
+                "role": user_data.role,
+            }
+            for user_data, hashed in zip(sample_users, hashes)
+        ]
+
+        # 单条INSERT IGNORE：一次网络往返写入全部示例用户，
+        # 已存在的用户名/邮箱由唯一索引直接跳过，天然幂等
+        await db.execute(insert(UserDB).prefix_with("IGNORE").values(rows))
+        await db.commit()
\ No newline at end of file
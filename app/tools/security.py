@@ -1,8 +1,16 @@
-from datetime import datetime, timedelta
+import asyncio
+import time
+from datetime import timedelta
 from typing import Optional
 from jose import JWTError, jwt
+from passlib.context import CryptContext
 from app.config import settings
-import bcrypt
+
+# JWT签名参数（模块级常量：签发/验证是每个认证请求的热路径，
+# 不必每次重查settings属性、也不必每次decode都新建算法列表）
+_JWT_SECRET = settings.JWT_SECRET_KEY
+_JWT_ALG = settings.JWT_ALGORITHM
+_JWT_ALGS = [_JWT_ALG]
 
 # JWT工具类
 class JWTManager:
@@ -10,42 +18,59 @@ class JWTManager:
     def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
         """创建访问token"""
         to_encode = data.copy()
+        # 直接用整数epoch秒作为exp：省去datetime/timedelta对象构造，
+        # 也避免本地时区naive datetime在跨时区部署时的偏差
         if expires_delta:
-            expire = datetime.now() + expires_delta
+            expire = int(time.time()) + int(expires_delta.total_seconds())
         else:
-            expire = datetime.now() + timedelta(minutes=settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES)
-        
-        to_encode.update({"exp": expire})
-        encoded_jwt = jwt.encode(
-            to_encode, 
-            settings.JWT_SECRET_KEY, 
-            algorithm=settings.JWT_ALGORITHM
-        )
+            expire = int(time.time()) + settings.JWT_ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+        to_encode["exp"] = expire
+        encoded_jwt = jwt.encode(to_encode, _JWT_SECRET, algorithm=_JWT_ALG)
         return encoded_jwt
-    
+
     @staticmethod
     def verify_token(token: str) -> Optional[dict]:
         """验证token"""
         try:
-            payload = jwt.decode(
-                token, 
-                settings.JWT_SECRET_KEY, 
-                algorithms=[settings.JWT_ALGORITHM]
-            )
+            payload = jwt.decode(token, _JWT_SECRET, algorithms=_JWT_ALGS)
             return payload
         except JWTError:
             return None
 
+# 密码哈希上下文
+# 使用 argon2id 作为默认算法，bcrypt 作为兼容算法（验证旧哈希后自动升级）
+# 成本参数放在配置中，运维可以根据目标机器调整（目标：单次哈希约250ms）
+# 登录成功后签发JWT，后续请求只做HS256解码（~1µs），不再触发KDF
+pwd_context = CryptContext(
+    schemes=["argon2", "bcrypt"],
+    deprecated="auto",
+    argon2__time_cost=settings.PASSWORD_HASH_TIME_COST,
+    argon2__memory_cost=settings.PASSWORD_HASH_MEMORY_COST,
+    argon2__parallelism=settings.PASSWORD_HASH_PARALLELISM,
+)
+
 # 密码工具
 class PasswordManager:
     @staticmethod
     def verify_password(plain_password: str, hashed_password: str) -> bool:
         """验证密码"""
-        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-    
+        return pwd_context.verify(plain_password, hashed_password)
+
     @staticmethod
     def get_password_hash(password: str) -> str:
         """获取密码哈希值"""
-        salt = bcrypt.gensalt()
-        hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-        return hashed.decode('utf-8')
\ No newline at end of file
+        return pwd_context.hash(password)
+
+    # async端点内必须用下面的异步版本：argon2单次约250ms，
+    # 同步调用会阻塞事件循环；KDF在C层释放GIL，线程化后
+    # 并发登录可以真正跨核并行
+    @staticmethod
+    async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+        """验证密码（线程池执行，不阻塞事件循环）"""
+        return await asyncio.to_thread(pwd_context.verify, plain_password, hashed_password)
+
+    @staticmethod
+    async def get_password_hash_async(password: str) -> str:
+        """获取密码哈希值（线程池执行，不阻塞事件循环）"""
+        return await asyncio.to_thread(pwd_context.hash, password)
\ No newline at end of file
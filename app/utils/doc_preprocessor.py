@@ -1,37 +1,150 @@
 import re
+import os
+import concurrent.futures
 import pdfplumber
+from dataclasses import dataclass, field
+from functools import lru_cache
+from itertools import chain
+
+try:
+    # C后端的pypdfium2做纯文本提取远快于pdfminer系；
+    # 这里只要文本，不需要pdfplumber的表格/坐标等能力
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
 from typing import List, Dict, Any, Tuple, Optional
 from langchain_core.documents import Document
 import logging
 
+# 完整语义单元的句末标点
+_TERMINATORS = frozenset('。！？；')
+
+
+# 结构记录用槽化dataclass而非dict：大部头书有数百个章节对象，
+# 每个dict头部两百多字节；slots省掉实例字典，属性访问也从
+# 哈希查找变成C层的槽位读取
+@dataclass(slots=True)
+class Preface:
+    title: str
+    content: List[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Chapter:
+    title: str
+    content: List[str] = field(default_factory=list)
+    annotations: List[str] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class Volume:
+    title: str
+    volume_index: str
+    chapters: List[Chapter] = field(default_factory=list)
+
+# 中文数字映射
+_CN_DIGITS = {
+    '一': '1', '二': '2', '三': '3', '四': '4', '五': '5',
+    '六': '6', '七': '7', '八': '8', '九': '9', '十': '10'
+}
+
+_RE_CHAPTER_NUM = re.compile(r'^([一二三四五六七八九十])、')
+_RE_CHAPTER_NUM_ALTS = (
+    re.compile(r'^（([一二三四五六七八九十])）'),
+    re.compile(r'^([0-9]+)\.'),
+)
+
+
+def _chinese_to_number(chinese_num: str) -> str:
+    """中文数字转阿拉伯数字"""
+    return _CN_DIGITS.get(chinese_num, chinese_num)
+
+
+@lru_cache(maxsize=256)
+def _extract_chapter_index(title: str) -> str:
+    """从章节标题中提取章节编号
+
+    大章节拆成段落块时每个块都带同一个标题，lru_cache让同一标题
+    只做一次正则匹配。
+    """
+    # 匹配 "一、八卦章" 这种格式
+    match = _RE_CHAPTER_NUM.match(title)
+    if match:
+        return _chinese_to_number(match.group(1))
+
+    # 匹配其他编号格式
+    for pattern in _RE_CHAPTER_NUM_ALTS:
+        match = pattern.match(title)
+        if match:
+            return match.group(1)
+
+    return "未知"
+
+
+def _extract_one_page(pdf_path: str, page_number: int) -> Optional[str]:
+    """子进程内提取单页文本（模块级函数才能被pickle到工作进程）"""
+    # 优先走pypdfium2；取回空文本时（可能是纯扫描页）再让
+    # pdfplumber确认一次，未安装pypdfium2则直接走pdfplumber
+    if pdfium is not None:
+        doc = pdfium.PdfDocument(pdf_path)
+        try:
+            text = doc[page_number - 1].get_textpage().get_text_range()
+        finally:
+            doc.close()
+        if text:
+            return text
+
+    with pdfplumber.open(pdf_path) as pdf:
+        page = pdf.pages[page_number - 1]
+        # 纯扫描页没有字符对象，提前跳过，不进文本聚类
+        if not page.chars:
+            return None
+        # 古籍是简单单栏版式，不需要pdfplumber的完整布局聚类：
+        # use_text_flow=True按内容流原序输出、跳过字符重排序，
+        # layout=False关掉位置保持的布局重建，其余参数取保守默认
+        return page.extract_text(
+            x_tolerance=3,
+            y_tolerance=3,
+            keep_blank_chars=False,
+            use_text_flow=True,
+            layout=False,
+        )
+
+
+# 页级提取进程池：pdfplumber逐页解析是纯CPU工作且受GIL限制，
+# 多页PDF分发到子进程后按核数并行
+_PAGE_POOL = concurrent.futures.ProcessPoolExecutor(
+    max_workers=max(1, (os.cpu_count() or 2) - 1)
+)
+
 class ZengShanBuYiPreprocessor:
     """《增删卜易》专用预处理和分块器"""
     
     def __init__(self):
         self.logger = logging.getLogger("ZengShanBuYiPreprocessor")
-        
-        # 定义结构模式
-        self.structure_patterns = {
-            'toc': r'^目\s*录',
-            'volume': r'^【卷之[一二三四五六七八九十]+】',
-            'chapter': [
-                r'^[一二三四五六七八九十]、[^\.]+章',
-                r'^[^\.]+章',
-                r'^[①②③④⑤⑥⑦⑧⑨⑩]、[^\.]+',
-            ],
-            'annotation': [
-                r'^\[乾按\].*',
-                r'^\[注\].*',
-                r'^\[居士按\].*',
-            ],
-            'page_number': r'^\d+$'
-        }
-        
-        # 中文数字映射
-        self.chinese_numbers = {
-            '一': '1', '二': '2', '三': '3', '四': '4', '五': '5',
-            '六': '6', '七': '7', '八': '8', '九': '9', '十': '10'
-        }
+
+        # 结构模式一次性预编译：解析循环按行×模式数调用匹配，
+        # 直接持有compiled pattern，省去每次经过re模块的字符串查表
+        self._re_toc = re.compile(r'^目\s*录')
+        self._re_volume = re.compile(r'^【卷之[一二三四五六七八九十]+】')
+        # 章节/注释的候选模式合并成单个选择分支：每行一次match
+        # 跑一台状态机，而不是依次重启多个正则
+        self._re_chapter = re.compile(
+            r'^(?:[一二三四五六七八九十]、[^\.]+章'
+            r'|[^\.]+章'
+            r'|[①②③④⑤⑥⑦⑧⑨⑩]、[^\.]+)'
+        )
+        self._re_annotation = re.compile(r'^\[(?:乾按|注|居士按)\]')
+        # 章节标题必要条件的廉价预筛：要么以编号字符开头，要么含"章"。
+        # 绝大多数正文行两者都不满足，可以完全不进正则引擎
+        self._chap_lead = frozenset('一二三四五六七八九十①②③④⑤⑥⑦⑧⑨⑩')
+        self._re_page_number = re.compile(r'^\d+$')
+        # 页面清理的三个全文sub（见_clean_page_text）
+        self._re_ws_run = re.compile(r'[^\S\n]+')
+        self._re_line_breaks = re.compile(r'\s*\n\s*')
+        self._re_page_line = re.compile(r'(?m)^\d{1,3}$\n?')
+        self._re_toc_dots = re.compile(r'\.{3,}\s*\d+')
+        self._re_para_split = re.compile(r'([。！？；]|\n\n|\n)')
 
     def extract_text_from_pdf(self, pdf_path: str) -> Dict[str, Any]:
         """
@@ -44,31 +157,43 @@ class ZengShanBuYiPreprocessor:
             Dict: 包含文本和结构信息
         """
         self.logger.info(f"开始提取PDF文本: {pdf_path}")
-        
-        full_text = ""
+
         pages_content = []
-        
+
         try:
+            # 主进程只打开一次PDF拿页数，逐页的文本提取分发到进程池
+            # 并行执行；map保持页序，清理仍在主进程完成（很轻）
             with pdfplumber.open(pdf_path) as pdf:
-                for page_num, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text:
-                        # 清理页面文本
-                        cleaned_text = self._clean_page_text(text, page_num + 1)
-                        full_text += cleaned_text + "\n"
-                        pages_content.append({
-                            "page_number": page_num + 1,
-                            "content": cleaned_text
-                        })
-            
+                page_count = len(pdf.pages)
+
+            page_numbers = range(1, page_count + 1)
+            texts = _PAGE_POOL.map(
+                _extract_one_page, [pdf_path] * page_count, page_numbers
+            )
+            for page_num, text in zip(page_numbers, texts):
+                if text:
+                    # 清理页面文本
+                    cleaned_text = self._clean_page_text(text, page_num)
+                    pages_content.append({
+                        "page_number": page_num,
+                        "content": cleaned_text
+                    })
+
             self.logger.info(f"PDF提取完成，共 {len(pages_content)} 页")
-            
-            # 解析文档结构
-            structure = self._parse_document_structure(full_text, pages_content)
-            
+
+            # 行列表只切分一次：结构解析和目录块构建都按行遍历，
+            # 各自split会把整本书重扫重分配一遍
+            lines = [
+                line for page in pages_content
+                for line in page["content"].split('\n')
+            ]
+
+            # 解析文档结构（不再拼接整本书的full_text副本）
+            structure = self._parse_document_structure(lines)
+
             return {
-                "full_text": full_text,
                 "pages": pages_content,
+                "lines": lines,
                 "structure": structure
             }
             
@@ -87,37 +212,25 @@ class ZengShanBuYiPreprocessor:
         Returns:
             str: 清理后的文本
         """
-        lines = text.split('\n')
-        cleaned_lines = []
-        
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # 过滤孤立页码
-            if re.match(self.structure_patterns['page_number'], line) and len(line) < 4:
-                continue
-                
-            # 清理多余空格
-            line = re.sub(r'\s+', ' ', line)
-            
-            cleaned_lines.append(line)
-            
-        return '\n'.join(cleaned_lines)
+        # 三次C层sub替代逐行的Python循环（split/strip/match/sub/join
+        # 对每行各走一遍，页面清理是纯字节搬运，少一遍遍历就少搬一遍）：
+        # 1) 行内空白压成单个空格；2) 行首尾空白和空行随换行一并收拢；
+        # 3) 删除孤立页码行（1-3位数字独占一行）
+        text = self._re_ws_run.sub(' ', text)
+        text = self._re_line_breaks.sub('\n', text)
+        text = self._re_page_line.sub('', text)
+        return text.strip()
 
-    def _parse_document_structure(self, text: str, pages: List[Dict]) -> Dict[str, Any]:
+    def _parse_document_structure(self, lines: List[str]) -> Dict[str, Any]:
         """
         解析文档结构
-        
+
         Args:
-            text: 完整文本
-            pages: 页面内容列表
-            
+            lines: 全文行列表
+
         Returns:
             Dict: 文档结构信息
         """
-        lines = text.split('\n')
         structure = {
             "has_toc": False,
             "preface": None,
@@ -134,68 +247,57 @@ class ZengShanBuYiPreprocessor:
                 continue
                 
             # 识别目录
-            if re.match(self.structure_patterns['toc'], line):
+            if self._re_toc.match(line):
                 structure["has_toc"] = True
                 current_section = "toc"
                 continue
                 
-            # 识别序言
-            if "增删卜易序" in line and current_section == "preface":
-                structure["preface"] = {
-                    "title": "增删卜易序",
-                    "content": line
-                }
+            # 识别序言（先查状态再做子串扫描：离开preface态后，
+            # 这条O(行长)的substring探测对全书剩余行直接短路跳过）
+            if current_section == "preface" and len(line) >= 5 and "增删卜易序" in line:
+                # content按行收集，消费时一次join：逐行+=会在每行
+                # 重建一个越来越长的字符串，对长序言/章节是二次方开销
+                structure["preface"] = Preface(title="增删卜易序", content=[line])
                 current_section = "preface_content"
                 continue
-                
+
             if current_section == "preface_content":
-                structure["preface"]["content"] += "\n" + line
+                structure["preface"].content.append(line)
                 # 序言结束条件（遇到第一个卷或章节）
-                if re.match(self.structure_patterns['volume'], line):
+                if self._re_volume.match(line):
                     current_section = "volume"
                 continue
                 
             # 识别卷
-            volume_match = re.match(self.structure_patterns['volume'], line)
+            volume_match = self._re_volume.match(line)
             if volume_match:
-                volume_info = {
-                    "title": line,
-                    "volume_index": self._chinese_to_number(line[3:-1]),
-                    "chapters": []
-                }
+                volume_info = Volume(
+                    title=line,
+                    volume_index=_chinese_to_number(line[3:-1]),
+                )
                 structure["volumes"].append(volume_info)
                 structure["current_volume"] = volume_info
                 current_section = "volume"
                 continue
                 
-            # 识别章节
-            chapter_found = False
-            for pattern in self.structure_patterns['chapter']:
-                if re.match(pattern, line):
-                    chapter_found = True
-                    if structure["current_volume"]:
-                        chapter_info = {
-                            "title": line,
-                            "content": "",
-                            "annotations": []
-                        }
-                        structure["current_volume"]["chapters"].append(chapter_info)
-                        structure["current_chapter"] = chapter_info
-                        current_section = "chapter_content"
-                    break
-                    
+            # 识别章节（先过首字符/含"章"预筛，正则只做最终校验）
+            chapter_found = bool(
+                (line[0] in self._chap_lead or '章' in line)
+                and self._re_chapter.match(line)
+            )
+            if chapter_found and structure["current_volume"]:
+                chapter_info = Chapter(title=line)
+                structure["current_volume"].chapters.append(chapter_info)
+                structure["current_chapter"] = chapter_info
+                current_section = "chapter_content"
+
             # 处理章节内容
             if not chapter_found and structure["current_chapter"]:
-                # 检查是否为注释
-                is_annotation = False
-                for pattern in self.structure_patterns['annotation']:
-                    if re.match(pattern, line):
-                        is_annotation = True
-                        structure["current_chapter"]["annotations"].append(line)
-                        break
-                
-                if not is_annotation:
-                    structure["current_chapter"]["content"] += line + "\n"
+                # 检查是否为注释（注释必定以'['开头，先看首字符）
+                if line[0] == '[' and self._re_annotation.match(line):
+                    structure["current_chapter"].annotations.append(line)
+                else:
+                    structure["current_chapter"].content.append(line)
                     
         return structure
 
@@ -219,20 +321,22 @@ class ZengShanBuYiPreprocessor:
         
         # 2. 处理目录
         if structure["has_toc"]:
-            toc_chunks = self._create_toc_chunks(document_data["full_text"])
+            toc_chunks = self._create_toc_chunks(document_data["lines"])
             chunks.extend(toc_chunks)
         
-        # 3. 处理各卷和章节
-        for volume in structure["volumes"]:
-            volume_chunks = self._process_volume_semantic(volume)
-            chunks.extend(volume_chunks)
+        # 3. 处理各卷和章节：chain.from_iterable把逐卷的块列表
+        # 在C层拉平，一次extend完成，免去逐卷的Python循环和中间状态
+        chunks.extend(chain.from_iterable(
+            self._process_volume_semantic(volume)
+            for volume in structure["volumes"]
+        ))
             
         self.logger.info(f"创建了 {len(chunks)} 个语义完整的知识块")
         return chunks
 
-    def _create_preface_chunk(self, preface: Dict[str, Any]) -> Document:
+    def _create_preface_chunk(self, preface: Preface) -> Document:
         """创建序言块"""
-        content = preface["title"] + "\n\n" + preface["content"]
+        content = preface.title + "\n\n" + "\n".join(preface.content)
         
         return Document(
             page_content=content,
@@ -248,9 +352,8 @@ class ZengShanBuYiPreprocessor:
             }
         )
 
-    def _create_toc_chunks(self, full_text: str) -> List[Document]:
+    def _create_toc_chunks(self, lines: List[str]) -> List[Document]:
         """创建目录块"""
-        lines = full_text.split('\n')
         toc_lines = []
         in_toc = False
         
@@ -260,19 +363,19 @@ class ZengShanBuYiPreprocessor:
                 continue
                 
             # 开始目录
-            if re.match(self.structure_patterns['toc'], line):
+            if self._re_toc.match(line):
                 in_toc = True
                 continue
-                
+
             # 结束目录（遇到第一个卷）
-            if in_toc and re.match(self.structure_patterns['volume'], line):
+            if in_toc and self._re_volume.match(line):
                 break
-                
+
             if in_toc and line:
                 # 清理目录行（去除页码和点）
-                cleaned_line = re.sub(r'\.{3,}\s*\d+', '', line).strip()
-                if (cleaned_line and len(cleaned_line) > 1 and 
-                    not re.match(r'^\d+$', cleaned_line)):
+                cleaned_line = self._re_toc_dots.sub('', line).strip()
+                if (cleaned_line and len(cleaned_line) > 1 and
+                    not self._re_page_number.match(cleaned_line)):
                     toc_lines.append(cleaned_line)
         
         if toc_lines:
@@ -298,47 +401,55 @@ class ZengShanBuYiPreprocessor:
         
         # 卷标题块
         volume_doc = Document(
-            page_content=volume["title"],
+            page_content=volume.title,
             metadata={
                 "content_type": "卷标题",
                 "block_type": "volume_title",
-                "volume_title": volume["title"],
-                "volume_index": volume["volume_index"],
+                "volume_title": volume.title,
+                "volume_index": volume.volume_index,
                 "chapter_title": "卷标题",
                 "chapter_index": "0"
             }
         )
         chunks.append(volume_doc)
-        
-        # 处理卷内章节
-        for chapter in volume["chapters"]:
-            chapter_chunks = self._process_chapter_semantic(chapter, volume)
-            chunks.extend(chapter_chunks)
-            
+
+        # 处理卷内章节（同上，按章拉平后一次extend）
+        chunks.extend(chain.from_iterable(
+            self._process_chapter_semantic(chapter, volume)
+            for chapter in volume.chapters
+        ))
+
         return chunks
 
-    def _process_chapter_semantic(self, chapter: Dict[str, Any], volume: Dict[str, Any]) -> List[Document]:
+    def _process_chapter_semantic(self, chapter: Chapter, volume: Volume) -> List[Document]:
         """处理章节的语义分块"""
         chunks = []
-        
-        # 章节标题和内容合并为一个语义块
-        chapter_content = self._build_chapter_content(chapter)
-        
+
+        # 分流决策直接用存好的行列表做O(行数)长度估算，
+        # 不为量长度先拼一遍整串；与精确长度至多差几个分隔符字节，
+        # 对启发式阈值无影响
+        approx_len = (
+            len(chapter.title)
+            + sum(len(line) + 1 for line in chapter.content)
+            + sum(len(anno) + 1 for anno in chapter.annotations)
+        )
+
         # 如果章节内容过长，按语义分割
-        if len(chapter_content) > 1500:  # 阈值可根据需要调整
+        if approx_len > 1500:  # 阈值可根据需要调整
+            chapter_content = self._build_chapter_content(chapter)
             sub_chunks = self._split_large_chapter(chapter_content, chapter, volume)
             chunks.extend(sub_chunks)
         else:
-            # 整个章节作为一个语义块
+            # 整个章节作为一个语义块（标题和内容合并）
             chapter_doc = Document(
-                page_content=chapter_content,
+                page_content=self._build_chapter_content(chapter),
                 metadata={
                     "content_type": "章节",
                     "block_type": "chapter",
-                    "volume_title": volume["title"],
-                    "volume_index": volume["volume_index"],
-                    "chapter_title": chapter["title"],
-                    "chapter_index": self._extract_chapter_index(chapter["title"]),
+                    "volume_title": volume.title,
+                    "volume_index": volume.volume_index,
+                    "chapter_title": chapter.title,
+                    "chapter_index": _extract_chapter_index(chapter.title),
                     "language_style": "文言文",
                     "era": "清代"
                 }
@@ -347,110 +458,102 @@ class ZengShanBuYiPreprocessor:
             
         return chunks
 
-    def _build_chapter_content(self, chapter: Dict[str, Any]) -> str:
+    def _build_chapter_content(self, chapter: Chapter) -> str:
         """构建章节完整内容"""
-        content = chapter["title"] + "\n\n"
-        content += chapter["content"]
-        
+        body = "\n".join(chapter.content)
+        if body:
+            body += "\n"
+        content = chapter.title + "\n\n" + body
+
         # 添加注释
-        if chapter["annotations"]:
-            content += "\n\n" + "\n".join(chapter["annotations"])
+        if chapter.annotations:
+            content += "\n\n" + "\n".join(chapter.annotations)
             
         return content.strip()
 
-    def _split_large_chapter(self, content: str, chapter: Dict[str, Any], 
-                           volume: Dict[str, Any]) -> List[Document]:
+    def _split_large_chapter(self, content: str, chapter: Chapter,
+                           volume: Volume) -> List[Document]:
         """分割大章节"""
         chunks = []
-        
+
         # 按段落分割
         paragraphs = self._split_classical_paragraphs(content)
-        
+
+        # 段落块的metadata除paragraph_index外完全相同：
+        # 基础dict在循环外构建一次，循环内只copy+覆盖一个键
+        base_meta = {
+            "content_type": "章节段落",
+            "block_type": "chapter_paragraph",
+            "volume_title": volume.title,
+            "volume_index": volume.volume_index,
+            "chapter_title": chapter.title,
+            "chapter_index": _extract_chapter_index(chapter.title),
+            "language_style": "文言文",
+            "era": "清代"
+        }
+
         for i, para in enumerate(paragraphs):
-            if para.strip() and len(para.strip()) > 50:  # 过滤太短的段落
-                doc = Document(
-                    page_content=para.strip(),
-                    metadata={
-                        "content_type": "章节段落",
-                        "block_type": "chapter_paragraph",
-                        "volume_title": volume["title"],
-                        "volume_index": volume["volume_index"],
-                        "chapter_title": chapter["title"],
-                        "chapter_index": self._extract_chapter_index(chapter["title"]),
-                        "paragraph_index": i + 1,
-                        "language_style": "文言文",
-                        "era": "清代"
-                    }
-                )
-                chunks.append(doc)
-                
+            para = para.strip()
+            if len(para) > 50:  # 过滤太短的段落
+                metadata = base_meta.copy()
+                metadata["paragraph_index"] = i + 1
+                chunks.append(Document(page_content=para, metadata=metadata))
+
         return chunks
 
-    def _split_classical_paragraphs(self, text: str) -> List[str]:
-        """专门针对文言文的分割方法"""
-        # 文言文分割点
-        separators = ['\n\n', '。', '！', '？', '；', '\n']
-        
-        paragraphs = []
+    def _split_classical_paragraphs(self, text: str):
+        """专门针对文言文的分割方法
+
+        生成器单遍完成分割与短段合并：原来先攒出完整的paragraphs
+        列表再二次遍历合并，这里每产出一个语义段就直接进合并缓冲，
+        缓冲够长（800阈值）立即yield，不再持有中间列表。
+        """
+        # 带捕获组的re.split在C层一次扫完全文，返回片段与分隔符交替的
+        # 列表，替代逐字符的Python循环；按(片段, 分隔符)成对推进，
+        # 语义与原来在每个分割点处检查一次完全一致
+        pieces = self._re_para_split.split(text)
+
+        buf: List[str] = []
+        buf_len = 0         # len("\n".join(buf))，随append增量维护
         current_para = ""
-        
-        for char in text:
-            current_para += char
-            if char in separators:
-                if current_para.strip():
-                    # 检查是否包含完整的语义单元
-                    if self._is_semantic_unit(current_para):
-                        paragraphs.append(current_para.strip())
-                        current_para = ""
-        
-        # 处理最后一段
-        if current_para.strip():
-            paragraphs.append(current_para.strip())
-            
-        # 合并过短的段落
-        merged_paragraphs = []
-        temp_para = ""
-        
-        for para in paragraphs:
-            if len(temp_para + para) < 800:  # 合并阈值
-                temp_para += "\n" + para if temp_para else para
-            else:
-                if temp_para:
-                    merged_paragraphs.append(temp_para)
-                temp_para = para
-                
-        if temp_para:
-            merged_paragraphs.append(temp_para)
-            
-        return merged_paragraphs
+        has_terminator = False
 
-    def _is_semantic_unit(self, text: str) -> bool:
-        """判断是否为完整的语义单元"""
-        # 包含完整的句子结构
-        if len(text) < 20:
-            return False
-            
-        # 包含关键标点
-        if not any(marker in text for marker in ['。', '！', '？', '；']):
-            return False
-            
-        return True
+        def _merge(para: str):
+            """把一个语义段并入缓冲；缓冲放不下时先吐出已合并段"""
+            nonlocal buf, buf_len
+            if buf_len + len(para) < 800:  # 合并阈值
+                if buf:
+                    buf_len += 1  # 合并时插入的'\n'
+                buf.append(para)
+                buf_len += len(para)
+                return None
+            merged = "\n".join(buf) if buf else None
+            buf = [para]
+            buf_len = len(para)
+            return merged
 
-    def _chinese_to_number(self, chinese_num: str) -> str:
-        """中文数字转阿拉伯数字"""
-        return self.chinese_numbers.get(chinese_num, chinese_num)
+        for i in range(0, len(pieces) - 1, 2):
+            current_para += pieces[i] + pieces[i + 1]
+            # 语义单元判断就地完成：分隔符已知，见过句末标点就置位，
+            # 不必每个分割点都对累积文本做一遍substring扫描
+            has_terminator = has_terminator or pieces[i + 1] in _TERMINATORS
+            if has_terminator and len(current_para) >= 20:
+                stripped = current_para.strip()
+                if stripped:
+                    ready = _merge(stripped)
+                    if ready:
+                        yield ready
+                    current_para = ""
+                    has_terminator = False
+
+        # 处理最后一段（split的末尾片段后面没有分隔符）
+        stripped = (current_para + pieces[-1]).strip()
+        if stripped:
+            ready = _merge(stripped)
+            if ready:
+                yield ready
+
+        # 排空合并缓冲
+        if buf:
+            yield "\n".join(buf)
 
-    def _extract_chapter_index(self, title: str) -> str:
-        """从章节标题中提取章节编号"""
-        # 匹配 "一、八卦章" 这种格式
-        match = re.match(r'^([一二三四五六七八九十])、', title)
-        if match:
-            return self._chinese_to_number(match.group(1))
-            
-        # 匹配其他编号格式
-        for pattern in [r'^（([一二三四五六七八九十])）', r'^([0-9]+)\.']:
-            match = re.match(pattern, title)
-            if match:
-                return match.group(1)
-                
-        return "未知"
\ No newline at end of file
@@ -0,0 +1,39 @@
+"""密码哈希基准测试
+
+用于校准 argon2 成本参数（PASSWORD_HASH_TIME_COST 等），
+目标：单次哈希耗时在 200-300ms 之间。
+
+用法: python scripts/bench_password_hash.py
+"""
+import time
+
+from app.tools.security import PasswordManager
+
+TARGET_MIN_MS = 200
+TARGET_MAX_MS = 300
+ROUNDS = 5
+
+
+def main():
+    # 预热一次，排除首次加载开销
+    PasswordManager.get_password_hash("warmup-password")
+
+    total = 0.0
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        PasswordManager.get_password_hash("benchmark-password")
+        total += time.perf_counter() - start
+
+    avg_ms = total / ROUNDS * 1000
+    print(f"平均哈希耗时: {avg_ms:.1f} ms（目标 {TARGET_MIN_MS}-{TARGET_MAX_MS} ms）")
+
+    if avg_ms < TARGET_MIN_MS:
+        print("哈希太快，建议提高 PASSWORD_HASH_TIME_COST / PASSWORD_HASH_MEMORY_COST")
+    elif avg_ms > TARGET_MAX_MS:
+        print("哈希太慢，建议降低 PASSWORD_HASH_TIME_COST / PASSWORD_HASH_MEMORY_COST")
+    else:
+        print("成本参数合适")
+
+
+if __name__ == "__main__":
+    main()